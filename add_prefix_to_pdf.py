@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 """为指PDF文件添加前缀序号
+
+序号由持久化的分配器统一分配，保存在目标文件夹中的 .prefix_state.json：
+- 序号单调递增且永不复用，新增文件不会影响已有文件的序号；
+- 序号宽度按文件规模确定，并预留增长空间；
+- 每批重命名先写入日志文件 .prefix_journal.json，中途中断后可在下次运行时恢复。
 """
 import os
-import glob
+import json
 import re
 import logging
 
@@ -10,53 +15,164 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+STATE_FILE = ".prefix_state.json"
+JOURNAL_FILE = ".prefix_journal.json"
+MIN_WIDTH = 2
+
 
 def is_filename_valid(filename):
     """检查文件名是否已符合规范"""
-    return re.match(r"^\d+_.*\.pdf$", filename) is not None
+    return re.match(r"^\d+_.*\.pdf$", filename, re.IGNORECASE) is not None
 
 
-def add_prefix_to_pdf(directory):
-    """
-    为PDF文件添加序号前缀，如果文件名已符合规范则不添加
-    :param directory: 要处理的目录路径
-    """
-    logging.info(f"开始处理文件夹: {directory}")
+def _write_json_atomic(path, data):
+    """先写临时文件再替换，保证文件内容完整"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
-    try:
-        pdf_files = glob.glob(os.path.join(directory, "*.pdf"))
-        if not pdf_files:
-            logging.warning(f"在 {directory} 中没有找到PDF文件")
+
+def _rename_exclusive(source_path, target_path):
+    """以硬链接方式重命名，目标已存在时抛出 FileExistsError，不会覆盖已有文件"""
+    os.link(source_path, target_path)
+    os.remove(source_path)
+
+
+class PrefixAllocator:
+    """持久化的序号分配器"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_FILE)
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.state = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def initialize(self, filenames, new_count):
+        """
+        首次使用时根据已有的带序号PDF文件数量初始化分配器状态。
+        以数量而非最大序号起始，避免以年份等数字开头的标题（如 2023_年度报告.pdf）抬高序号。
+
+        Args:
+            filenames (list): 文件夹中的文件名。
+            new_count (int): 本次待分配的文件数量。
+        """
+        existing = sum(1 for name in filenames if is_filename_valid(name))
+        next_id = existing + 1
+        # 宽度按当前规模的十倍预留，避免文件增长后序号溢出
+        width = max(MIN_WIDTH, len(str((next_id + new_count) * 10)))
+        self.state = {"next_id": next_id, "width": width}
+
+    def allocate(self, count):
+        """
+        分配一段连续的新序号。
+
+        Returns:
+            list: 格式化后的序号字符串列表。
+        """
+        start = self.state["next_id"]
+        end = start + count
+        width = self.state["width"]
+        if len(str(end - 1)) > width:
+            width = len(str(end - 1))
+            logging.warning(f"序号超出原有宽度，新文件使用 {width} 位序号")
+            self.state["width"] = width
+        self.state["next_id"] = end
+        return [str(i).zfill(width) for i in range(start, end)]
+
+    def recover(self):
+        """如果存在未完成的重命名日志，则继续完成其中的重命名并更新状态"""
+        if not os.path.exists(self.journal_path):
             return
+        logging.warning(f"检测到未完成的重命名批次，开始恢复: {self.journal_path}")
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            journal = json.load(f)
+        for source, target in journal["renames"]:
+            source_path = os.path.join(self.directory, source)
+            target_path = os.path.join(self.directory, target)
+            if not os.path.exists(source_path):
+                continue
+            if os.path.exists(target_path):
+                if os.path.samefile(source_path, target_path):
+                    # 中断于建立硬链接之后、删除原文件之前
+                    os.remove(source_path)
+                else:
+                    logging.error(f"目标文件已存在，跳过重命名: {source} -> {target}")
+                continue
+            _rename_exclusive(source_path, target_path)
+        self.state = journal["state"]
+        _write_json_atomic(self.state_path, self.state)
+        os.remove(self.journal_path)
 
-        pdf_files.sort()
-        renamed_count = 0
-        skipped_count = 0
+    def apply(self, renames):
+        """
+        以单个日志批次执行重命名：写日志 -> 重命名 -> 写状态 -> 删除日志。
+
+        Args:
+            renames (list): [(原文件名, 新文件名), ...]。
 
-        for index, file_path in enumerate(pdf_files, start=1):
+        Returns:
+            int: 成功重命名的文件数量。
+        """
+        _write_json_atomic(
+            self.journal_path, {"renames": renames, "state": self.state}
+        )
+        renamed_count = 0
+        for source, target in renames:
             try:
-                dir_name = os.path.dirname(file_path)
-                base_name = os.path.basename(file_path)
+                _rename_exclusive(
+                    os.path.join(self.directory, source),
+                    os.path.join(self.directory, target),
+                )
+                logging.info(f"重命名: {source} 为 {target}")
+                renamed_count += 1
+            except FileExistsError:
+                logging.error(f"目标文件已存在，跳过重命名: {source} -> {target}")
+            except OSError as e:
+                logging.error(f"重命名文件时出错: {source}. 错误: {str(e)}")
+        _write_json_atomic(self.state_path, self.state)
+        os.remove(self.journal_path)
+        return renamed_count
 
-                if is_filename_valid(base_name):
-                    logging.info(f"文件已符合规范，跳过: {base_name}")
-                    skipped_count += 1
-                    continue
 
-                new_name = f"{str(index).zfill(2)}_{base_name}"
-                new_path = os.path.join(dir_name, new_name)
+def add_prefix_to_pdf(directory, new_files=None):
+    """
+    为PDF文件添加序号前缀，如果文件名已符合规范则不添加
+    :param directory: 要处理的目录路径
+    :param new_files: 新增的文件名列表，提供时只处理这些文件，无需扫描整个目录
+    """
+    logging.info(f"开始处理文件夹: {directory}")
+
+    try:
+        allocator = PrefixAllocator(directory)
+        allocator.recover()
 
-                if os.path.exists(new_path):
-                    logging.warning(f"目标文件已存在，跳过: {new_path}")
-                    skipped_count += 1
-                    continue
+        filenames = None
+        if new_files is None or allocator.state is None:
+            # 只读取目录项，不对每个文件调用stat
+            with os.scandir(directory) as it:
+                filenames = [entry.name for entry in it]
+        if new_files is None:
+            new_files = [name for name in filenames if name.lower().endswith(".pdf")]
 
-                os.rename(file_path, new_path)
-                logging.info(f"重命名: {file_path} 为 {new_path}")
-                renamed_count += 1
+        pending = sorted(name for name in new_files if not is_filename_valid(name))
+        skipped_count = len(new_files) - len(pending)
+        if not pending:
+            logging.warning(f"在 {directory} 中没有需要添加序号的PDF文件")
+            return
 
-            except OSError as e:
-                logging.error(f"重命名文件时出错: {file_path}. 错误: {str(e)}")
+        if allocator.state is None:
+            allocator.initialize(filenames, len(pending))
+        prefixes = allocator.allocate(len(pending))
+        renames = [
+            [name, f"{prefix}_{name}"] for prefix, name in zip(prefixes, pending)
+        ]
+        renamed_count = allocator.apply(renames)
 
         logging.info(
             f"处理完成. 重命名: {renamed_count} 个文件, 跳过: {skipped_count} 个文件."
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""基于内容寻址的阶段产物存储模块
+
+流水线中每个阶段（文件名列表、TF-IDF矩阵、聚类结果、LLM分类结果）的输出
+都以"输入 + 参数"的哈希值作为键保存在本地。再次运行时若键命中，则直接
+复用产物并跳过该阶段；输入或参数发生变化时键随之变化，旧产物自然失效。
+
+存储格式：
+1. 小型结构化数据（文件名列表、分类结果）保存为JSON。
+2. 数组数据保存为 .npy 文件，加载时可使用内存映射，避免整体读入内存。
+3. 稀疏矩阵（CSR）拆分为 data/indices/indptr 三个数组分别保存。
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from config import ARTIFACT_CACHE_DIR
+
+
+def fingerprint_folder(directory, pattern=".pdf"):
+    """
+    计算文件夹中PDF文件的指纹，文件增删、改名或修改都会改变指纹。
+
+    Args:
+        directory (str): 文件夹路径。
+        pattern (str): 需要纳入指纹的文件扩展名。
+
+    Returns:
+        list: 按文件名排序的 [文件名, 大小, 修改时间] 列表。
+    """
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(pattern):
+                stat = entry.stat()
+                entries.append([entry.name, stat.st_size, stat.st_mtime_ns])
+    entries.sort()
+    return entries
+
+
+def make_key(stage, *inputs, **params):
+    """
+    根据阶段名称、输入与参数计算产物键。
+
+    Args:
+        stage (str): 阶段名称。
+        *inputs: 阶段输入（需可JSON序列化，或为上游产物键）。
+        **params: 阶段参数。
+
+    Returns:
+        str: SHA-256 十六进制摘要。
+    """
+    payload = json.dumps(
+        [stage, inputs, params], ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """阶段产物存储，目录结构为 <root>/<stage>/<key>.json 或 <root>/<stage>/<key>/"""
+
+    def __init__(self, root=ARTIFACT_CACHE_DIR):
+        self.root = root
+
+    def _path(self, stage, key, suffix=""):
+        return os.path.join(self.root, stage, key + suffix)
+
+    def save_json(self, stage, key, data):
+        """以原子方式保存JSON产物"""
+        path = self._path(stage, key, ".json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear_stage(self, stage):
+        """删除某一阶段的全部产物，下次运行时该阶段重新计算"""
+        shutil.rmtree(os.path.join(self.root, stage), ignore_errors=True)
+
+    def load_json(self, stage, key):
+        """加载JSON产物，不存在时返回None"""
+        path = self._path(stage, key, ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_arrays(self, stage, key, **arrays):
+        """
+        以原子方式保存一组数组产物，每个数组一个 .npy 文件。
+        产物按内容寻址，同一键的内容相同，因此目标已存在时直接丢弃本次写入，
+        多个写入方并发保存同一键也是安全的。
+
+        Args:
+            stage (str): 阶段名称。
+            key (str): 产物键。
+            **arrays: 数组名称与数组。
+        """
+        path = self._path(stage, key)
+        if os.path.isdir(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, name + ".npy"), np.asarray(array))
+            try:
+                os.rename(tmp_dir, path)
+            except OSError:
+                # 其他写入方已保存了同一键，视为已写入
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def load_arrays(self, stage, key, mmap=True):
+        """
+        加载一组数组产物。
+
+        Args:
+            stage (str): 阶段名称。
+            key (str): 产物键。
+            mmap (bool): 是否以只读内存映射方式加载。
+
+        Returns:
+            dict: 数组名称到数组的映射，不存在时返回None。
+        """
+        path = self._path(stage, key)
+        if not os.path.isdir(path):
+            return None
+        mmap_mode = "r" if mmap else None
+        return {
+            os.path.splitext(name)[0]: np.load(
+                os.path.join(path, name), mmap_mode=mmap_mode
+            )
+            for name in os.listdir(path)
+            if name.endswith(".npy")
+        }
+
+    def save_sparse(self, stage, key, matrix):
+        """保存CSR稀疏矩阵"""
+        matrix = matrix.tocsr()
+        self.save_arrays(
+            stage,
+            key,
+            data=matrix.data.astype(np.float32),
+            indices=matrix.indices,
+            indptr=matrix.indptr,
+            shape=np.array(matrix.shape, dtype=np.int64),
+        )
+
+    def load_sparse(self, stage, key, mmap=True):
+        """加载CSR稀疏矩阵，不存在时返回None"""
+        from scipy.sparse import csr_matrix
+
+        arrays = self.load_arrays(stage, key, mmap=mmap)
+        if arrays is None:
+            return None
+        return csr_matrix(
+            (arrays["data"], arrays["indices"], arrays["indptr"]),
+            shape=tuple(int(n) for n in arrays["shape"]),
+        )
@@ -7,6 +7,11 @@ SOURCE_PDF_FOLDER = r"[添加你的PDF原始文件夹绝对路径]"
 # 规范化PDF文件名文件夹，需修改
 FORMATED_PDF_NAME_FOLDER = r"[添加规范化处理后的PDF文件夹绝对路径]"
 
-PDF_NAME_CACHE_FILE = "pdf_article_names.json"
+# 阶段产物缓存目录，按输入与参数的哈希值存储各阶段的中间结果
+ARTIFACT_CACHE_DIR = ".artifact_cache"
 # PDF分类文件夹，需修改
 PDF_CLASSIFICATION_DIR = r"[添加PDF分类文件夹绝对路径]"
+# 分类文献检索索引目录
+SEARCH_INDEX_DIR = ".search_index"
+# 多节点共享任务队列目录，需位于所有节点都能访问的共享目录中（如NFS挂载）
+WORK_QUEUE_DIR = r"[添加共享任务队列文件夹绝对路径]"
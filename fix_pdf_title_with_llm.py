@@ -4,20 +4,13 @@
 """
 import json
 import logging
-import os
 import re
 
-from openai import OpenAI
-
 from custom_exception import APIException
+from llm_client import get_deepseek_client
+from llm_metrics import run_metrics
 
 
-# DeepSeek配置
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.deepseek.com",
-)
-
 def split_title(title):
     """将标题拆分为四个部分"""
     match = re.match(r"^(.*?)(\.\.\.)(.*?)(_.*)$", title)
@@ -30,21 +23,19 @@ def split_title(title):
 
     return title, "", "", ""
 
-def get_paper_title_with_deepseek(text, original_title):
-    """
-    使用LLM模型从文本中提取并补充论文标题
-
-    :param text: 从PDF中提取的文本内容
-    :param original_title: 原始文件名中的标题部分
-    :return: 补充完整的论文标题
-    """
-
-    part1, part2, part3, _ = split_title(original_title)
-    part5 = ""
-    system_prompt = f"""
+# 系统提示词保持静态，使每次请求拥有字节一致的前缀，从而命中服务端的前缀缓存；
+# 每个文件各不相同的内容（标题片段、PDF文本）统一放在用户消息的末尾。
+TITLE_SYSTEM_PROMPT = """
         **背景**：  
         你是一名文件命名助手，需要根据输入的论文文本内容，将标题补充完整。
 
+        >>>>>>>>>>>>>>>>>>>>>  
+        **输入：**  
+        - 【标题前段】：原始文件名中省略号之前的部分。
+        - 【省略部分】：原始文件名中被省略的部分，以...表示。
+        - 【标题后段】：原始文件名中省略号之后的部分。
+        - 【文本内容】：从PDF中提取的文本。
+
         >>>>>>>>>>>>>>>>>>>>>  
         **规则：**  
         请根据以下规则从文本中补充论文的准确标题：  
@@ -53,30 +44,58 @@ def get_paper_title_with_deepseek(text, original_title):
         - 【完整提取】标题，若语义相近的标题跨越多行，说明可能存在【副标题】，请一并提取，
         使用【冒号】分隔主副标题。
         - 【不得包含】作者名、机构名、期刊名等内容。 
-        - 根据从文本内容中识别到的标题，更新{part2}，更新后的{part2}中不得包含...符号。
-        - 将更新后的{part2}内容放入{part5}中。
-        - 注意{part3}内容输出的完整，不要忽略该部分的输出整合。
+        - 根据从文本内容中识别到的标题，补全【省略部分】，补全后的内容中不得包含...符号。
+        - 注意【标题后段】内容输出的完整，不要忽略该部分的输出整合。
         - 最终输出标题中不得包含空格字符。
         - 输出的论文标题必须为中文。
 
         **输出标题：**  
-        - 以JSON格式输出: ["title": "{part1}{part5}{part3}"]
+        - 以JSON格式输出: {"title": "【标题前段】【补全后的省略部分】【标题后段】"}
 
     """
 
+TITLE_MODEL = "deepseek-coder"
+
+
+def build_title_messages(text, original_title):
+    """
+    构造标题补全请求的消息列表，静态指令在前，文件相关数据在后
+
+    :param text: 从PDF中提取的文本内容
+    :param original_title: 原始文件名中的标题部分
+    :return: 消息列表
+    """
+    part1, part2, part3, _ = split_title(original_title)
     user_prompt = f"""
-    文本内容：
+    【标题前段】：{part1}
+    【省略部分】：{part2}
+    【标题后段】：{part3}
+    【文本内容】：
     {text}
     """
-
-    messages = [
-        {"role": "system", "content": system_prompt},
+    return [
+        {"role": "system", "content": TITLE_SYSTEM_PROMPT},
         {"role": "user", "content": user_prompt},
     ]
 
+
+def get_paper_title_with_deepseek(text, original_title, client=None):
+    """
+    使用LLM模型从文本中提取并补充论文标题
+
+    :param text: 从PDF中提取的文本内容
+    :param original_title: 原始文件名中的标题部分
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :return: 补充完整的论文标题
+    """
+    client = client or get_deepseek_client()
+    messages = build_title_messages(text, original_title)
+
     try:
-        response = client.chat.completions.create(
-            model="deepseek-coder",
+        response = run_metrics.timed_call(
+            "fix_title",
+            client.chat.completions.create,
+            model=TITLE_MODEL,
             messages=messages,
             response_format={"type": "json_object"},
         )
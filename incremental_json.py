@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+增量解析LLM流式输出的分类JSON
+
+分类结果的结构为 {"主题分类": {"类别1": [...], "类别2": [...]}, "未分类": [...]}。
+解析器逐段接收模型输出的文本，每当"主题分类"下某个类别的列表闭合时，立即返回
+该类别及其文件名列表，调用方无需等待完整响应即可开始整理文件。
+"""
+import json
+
+CATEGORY_ROOT_KEY = "主题分类"
+
+
+class IncrementalCategoryParser:
+    """按字符扫描的增量JSON解析器，只跟踪容器嵌套、字符串与键"""
+
+    def __init__(self, root_key=CATEGORY_ROOT_KEY):
+        self.root_key = root_key
+        self.buffer = []
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string = None
+
+    def feed(self, text):
+        """
+        接收一段新的输出文本。
+
+        Args:
+            text (str): 模型新生成的文本片段。
+
+        Returns:
+            list: 本段文本中闭合的类别列表，元素为 (类别名称, 文件名列表)。
+        """
+        events = []
+        for char in text:
+            self.buffer.append(char)
+            index = self.position
+            self.position += 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    self.last_string = json.loads(
+                        "".join(self.buffer[self.string_start : index + 1])
+                    )
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+            elif char == ":" and self.stack and self.stack[-1]["type"] == "{":
+                self.stack[-1]["key"] = self.last_string
+            elif char in "{[":
+                self.stack.append({"type": char, "start": index, "key": None})
+            elif char in "}]" and self.stack:
+                container = self.stack.pop()
+                if char == "]" and self._is_category_list():
+                    titles = json.loads("".join(self.buffer[container["start"] : index + 1]))
+                    events.append((self.stack[-1]["key"], titles))
+        return events
+
+    def _is_category_list(self):
+        """当前闭合的列表是否位于 {"主题分类": {"类别": [...]}} 中"""
+        return (
+            len(self.stack) == 2
+            and self.stack[0]["type"] == "{"
+            and self.stack[0]["key"] == self.root_key
+            and self.stack[1]["type"] == "{"
+        )
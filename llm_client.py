@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+DeepSeek客户端
+
+客户端在首次使用时创建并在进程内共享，导入模块时不会创建HTTP连接，
+也不要求已配置API密钥（例如仅运行 --plan 预估时）。
+"""
+import functools
+import os
+
+from openai import OpenAI
+
+DEEPSEEK_BASE_URL = "https://api.deepseek.com/"
+
+
+@functools.lru_cache(maxsize=None)
+def get_deepseek_client():
+    """返回进程内共享的DeepSeek客户端，OpenAI客户端可在多线程间共享"""
+    return OpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=DEEPSEEK_BASE_URL,
+    )
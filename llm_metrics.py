@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+LLM调用运行指标统计
+
+记录每次调用的耗时与token用量，包括DeepSeek返回的提示词前缀缓存字段
+（prompt_cache_hit_tokens / prompt_cache_miss_tokens），用于核对前缀缓存
+带来的延迟与费用节省。
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+USAGE_FIELDS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "prompt_cache_hit_tokens",
+    "prompt_cache_miss_tokens",
+)
+
+
+class RunMetrics:
+    """按阶段累计LLM调用次数、耗时与token用量，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = defaultdict(lambda: defaultdict(float))
+
+    def record(self, stage, response, latency):
+        """
+        记录一次LLM调用。
+
+        Args:
+            stage (str): 阶段名称，例如 "fix_title"、"classify"。
+            response: OpenAI兼容接口的返回对象。
+            latency (float): 调用耗时（秒）。
+        """
+        usage = getattr(response, "usage", None)
+        with self._lock:
+            stats = self._stages[stage]
+            stats["calls"] += 1
+            stats["latency_seconds"] += latency
+            for field in USAGE_FIELDS:
+                stats[field] += getattr(usage, field, None) or 0
+
+    def record_timing(self, stage, **timings):
+        """
+        记录一次调用的时间指标（秒），例如首个结果到达时间与总耗时。
+
+        Args:
+            stage (str): 阶段名称。
+            **timings: 指标名称与秒数，按阶段累加。
+        """
+        with self._lock:
+            stats = self._stages[stage]
+            stats["calls"] += 1
+            for name, seconds in timings.items():
+                stats[name + "_seconds"] += seconds
+
+    def timed_call(self, stage, func, *args, **kwargs):
+        """调用 func 并记录其耗时与用量，返回 func 的返回值"""
+        start = time.perf_counter()
+        response = func(*args, **kwargs)
+        self.record(stage, response, time.perf_counter() - start)
+        return response
+
+    def summary(self):
+        """
+        汇总各阶段指标。
+
+        Returns:
+            dict: {阶段名称: {指标名称: 数值}}，记录了token用量的阶段包含缓存命中率 cache_hit_rate。
+        """
+        with self._lock:
+            result = {}
+            for stage, stats in self._stages.items():
+                stage_summary = {
+                    key: round(value, 3) if key.endswith("_seconds") else int(value)
+                    for key, value in stats.items()
+                }
+                if "prompt_tokens" in stats:
+                    cached = stats["prompt_cache_hit_tokens"]
+                    total = cached + stats["prompt_cache_miss_tokens"]
+                    stage_summary["cache_hit_rate"] = (
+                        round(cached / total, 4) if total else 0.0
+                    )
+                result[stage] = stage_summary
+            return result
+
+    def log_summary(self):
+        """将汇总指标写入日志"""
+        for stage, stats in self.summary().items():
+            logging.info("LLM运行指标 [%s]: %s", stage, stats)
+
+    def save(self, path):
+        """将汇总指标保存为JSON文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=4)
+
+
+# 进程内共享的运行指标
+run_metrics = RunMetrics()
@@ -6,6 +6,7 @@
 
 1. 使用正则表达式处理文件名。
 2. 读取指定文件夹下的PDF文件名。
+3. 以生成器方式逐个读取PDF文件名，适用于超大规模文件夹。
 """
 
 import glob
@@ -53,3 +54,19 @@ def load_pdf_names(directory):
         os.path.splitext(os.path.basename(file_path))[0] for file_path in pdf_files
     ]
     return pdf_names
+
+
+def iter_pdf_names(directory):
+    """
+    以生成器方式逐个读取指定文件夹下的PDF文件名，不排序也不整体载入内存。
+
+    Args:
+        directory (str): 文件夹路径。
+
+    Yields:
+        str: 文件名（不含扩展名）。
+    """
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                yield os.path.splitext(entry.name)[0]
@@ -7,24 +7,116 @@
 4. 主题分类：借助LLM参考聚类结果进行主题分类
 5. 文件整理：根据LLM分类结果将相应的本地PDF文件移动到相应的主题分类文件夹中
 """
-from add_prefix_to_pdf import add_prefix_to_pdf
-from config import SOURCE_PDF_FOLDER, FORMATED_PDF_NAME_FOLDER
-from pdf_classify import process_pdfs_cluster, scan_and_move_pdfs_back
-from pdf_name_normalize import rename_pdf_files
-from preprocess_title_with_kmeans import preprocess_with_kmeans
+import argparse
+import json
+
+from config import SOURCE_PDF_FOLDER, FORMATED_PDF_NAME_FOLDER, WORK_QUEUE_DIR
+from llm_metrics import run_metrics
+from pdf_classify import scan_and_move_pdfs_back
+from pdf_name_normalize import enqueue_pdf_files, rename_pdf_worker
+from pipeline import Pipeline, run_pipelines
+from plan_pipeline import plan_pipeline
+from preprocess_title_with_kmeans import preprocess_with_minibatch_kmeans
+from search_index import build_search_index, search_library
 
 if __name__ == '__main__':
-    # 1. 规范化命名PDF文件
-    rename_pdf_files(SOURCE_PDF_FOLDER, FORMATED_PDF_NAME_FOLDER)
+    parser = argparse.ArgumentParser(description="PDF文件自动分类工作流")
+    parser.add_argument(
+        "--plan", action="store_true", help="仅预估LLM调用次数、token、费用与耗时，不调用API"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="LLM调用并发数（标题补全与主题树各块分类），--plan 按同一并发数预估耗时",
+    )
+    parser.add_argument(
+        "--build-index", action="store_true", help="为分类文件夹中的文献建立检索索引"
+    )
+    parser.add_argument("--search", metavar="QUERY", help="在分类文献库中检索相关论文")
+    parser.add_argument("--top-k", type=int, default=10, help="检索返回的结果数量")
+    parser.add_argument(
+        "--enqueue", action="store_true", help="将原始文件夹中的PDF文件加入多节点共享任务队列"
+    )
+    parser.add_argument(
+        "--worker", action="store_true", help="以工作节点模式从共享队列领取并规范化PDF文件"
+    )
+    parser.add_argument(
+        "--stream", action="store_true", help="流式执行最终分类轮次，每个类别生成完毕即开始移动文件"
+    )
+    parser.add_argument(
+        "--stream-cluster",
+        type=int,
+        metavar="N_CLUSTERS",
+        help="对超大规模文件夹进行分块流式聚类，标签写入 pdf_names_clustered_labels.tsv",
+    )
+    parser.add_argument("--queue-dir", default=WORK_QUEUE_DIR, help="共享任务队列目录")
+    parser.add_argument(
+        "--libraries",
+        metavar="JSON_FILE",
+        help="在同一进程中处理多个文献库，文件内容为 [[原始文件夹, 规范化文件夹, 分类文件夹], ...]",
+    )
+    parser.add_argument(
+        "--max-category-size",
+        type=int,
+        help="生成两级主题树，文献先聚类划分为不超过该数量的块，再由LLM并行分类",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="同时处理的文献库数量")
+    args = parser.parse_args()
+
+    if args.plan:
+        report = plan_pipeline(
+            SOURCE_PDF_FOLDER,
+            concurrency=args.concurrency,
+            max_category_size=args.max_category_size,
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=4))
+        raise SystemExit(0)
+
+    if args.build_index:
+        build_search_index()
+        raise SystemExit(0)
+
+    if args.search:
+        search_library(args.search, top_k=args.top_k)
+        raise SystemExit(0)
+
+    if args.stream_cluster:
+        preprocess_with_minibatch_kmeans(n_clusters=args.stream_cluster)
+        raise SystemExit(0)
+
+    if args.enqueue:
+        enqueue_pdf_files(SOURCE_PDF_FOLDER, args.queue_dir)
+        raise SystemExit(0)
+
+    if args.worker:
+        rename_pdf_worker(SOURCE_PDF_FOLDER, FORMATED_PDF_NAME_FOLDER, args.queue_dir)
+        raise SystemExit(0)
 
-    # 2. 为PDF文件添加序号前缀
-    add_prefix_to_pdf(FORMATED_PDF_NAME_FOLDER)
+    if args.libraries:
+        with open(args.libraries, "r", encoding="utf-8") as f:
+            libraries = json.load(f)
+        base_pipeline = Pipeline(concurrency=args.concurrency)
+        run_pipelines(
+            [base_pipeline.with_folders(*folders) for folders in libraries],
+            max_workers=args.workers,
+            stream=args.stream,
+            max_category_size=args.max_category_size,
+        )
+        run_metrics.save("run_metrics.json")
+        raise SystemExit(0)
 
-    # 3. 借助KMeans对PDF文件名进行初步聚类
-    preprocess_with_kmeans()
+    # 依次执行：1. 规范化命名PDF文件；2. 为PDF文件添加序号前缀；
+    # 3. 借助KMeans对PDF文件名进行初步聚类，再借助LLM参考聚类结果进行主题分类，
+    # 并将PDF文件移动到相应的文件夹
+    # 各阶段产物缓存于 ARTIFACT_CACHE_DIR，输入未变化的阶段会被跳过
+    Pipeline(concurrency=args.concurrency).run(
+        stream=args.stream, max_category_size=args.max_category_size
+    )
+    run_metrics.log_summary()
 
-    # 4. 借助LLM参考聚类结果进行主题分类，并将PDF文件移动到相应的文件夹
-    process_pdfs_cluster()
+    # 保存LLM调用运行指标（含前缀缓存命中/未命中token数）
+    run_metrics.save("run_metrics.json")
 
-    # 5.如果对分类结果不满意，可以调用以下函数将PDF文件移回原始文件夹
+    # 4.如果对分类结果不满意，可以调用以下函数将PDF文件移回原始文件夹
     # scan_and_move_pdfs_back(FORMATED_PDF_NAME_FOLDER, PDF_CLASSIFICATION_DIR)
@@ -11,27 +11,20 @@ import json
 
 import os
 import shutil
-
-from openai import OpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import preprocess_title_with_kmeans
-from config import FORMATED_PDF_NAME_FOLDER, PDF_NAME_CACHE_FILE, PDF_CLASSIFICATION_DIR
+from artifact_store import ArtifactStore, fingerprint_folder, make_key
+from config import FORMATED_PDF_NAME_FOLDER, PDF_CLASSIFICATION_DIR
+from incremental_json import IncrementalCategoryParser
+from llm_client import get_deepseek_client
+from llm_metrics import run_metrics
 from load_pdf import load_pdf_names
 
-# DeepSeek配置
-deepseek_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    base_url="https://api.deepseek.com/",
-)
-
+CLASSIFY_MODEL = "deepseek-chat"
 
-def classify_pdfs_with_llm(pdf_names):
-    """
-    使用大语言模型根据文件名对PDF文件进行多轮分类
-    :param pdf_names: PDF文件名列表
-    :return: 分类结果
-    """
-    system_prompt = """
+CLASSIFY_SYSTEM_PROMPT = """
     任务描述:
     - 你是一位科研助理，将收到一组已经通过初步聚类的学术论文题目。\n
     - 你的任务是基于这个数据集，逐步(Step by Step)地开展适合人类阅读和理解的主题分类。\n
@@ -54,69 +47,175 @@ def classify_pdfs_with_llm(pdf_names):
     - 输出样式: {'主题分类': {'类别1': ['filename1', 'filename2'], '类别2': ['filename3', 'filename4']},
             '未分类': ['filename5', 'filename6']}
     """
-    messages = [
-        {"role": "system", "content": system_prompt},
+
+
+# 多轮对话中各轮的静态指令。系统提示词与这些指令均不含文件相关数据，
+# 后一轮请求的消息列表以前一轮请求为完整前缀，可持续命中服务端的前缀缓存。
+REFLECTION_PROMPT = (
+    "请反思（Reflection）上述主题分类结果的合理性。"
+    "确保每个有效主题类别至少包含3个标题，并且有效主题类别数量在5到10个之间。"
+    "同时，仔细考虑是否有标题应该被归类为'未分类'。确保所有输入的文件名都得到处理。"
+)
+FINAL_CHECK_PROMPT = (
+    "请再次检查一次分类结果，确保所有要求都被满足。特别注意：1) 是否有论文被强行分类到不太合适的类别中？"
+    "2) 是否有论文的主题与其他论文显著不同？如果有，请将这些论文移至'未分类'列表。"
+    "确保输出包含'主题分类'和'未分类'两个顶级键，即使'未分类'为空。确保所有输入的文件名都得到处理。"
+)
+UNCLASSIFIED_PROMPT = (
+    "请对未分类的文献逐步逐步地开展归类，尝试将它们加入到现有主题分类中或创建新的主题分类。未分类文献："
+)
+UNCLASSIFIED_OPTIMIZE_PROMPT = (
+    "请优化上述未分类文献的分类结果，尽量将它们整合到现有类别中，或在必要时创建新的合适类别。"
+)
+UNCLASSIFIED_FINAL_PROMPT = (
+    "请最后检查一次未分类文献的分类结果，确保它们被合理地分类或整合到现有类别中。"
+    "如果仍有无法分类的文献，请将它们保留在'未分类'类别中。"
+)
+
+
+TOPIC_LABEL_SYSTEM_PROMPT = """
+    任务描述:
+    - 你是一位科研助理，将收到若干组学术论文的主题类别名称，同一组的类别来自一批相近的论文。\n
+    - 请为每一组概括一个上级研究主题名称，名称应具体且有信息量，不同组的名称不能重复。\n
+
+    输入:\n
+    - 输入的数据集样式为： {"0": ['类别1', '类别2'], "1": ['类别3', '类别4']...}\n
+
+    输出:\n
+    - 输出应为一个JSON格式的对象，键为输入的组序号，值为该组的上级主题名称。\n
+    - 输出样式: {"0": '主题1', "1": '主题2'}
+    """
+
+
+def build_classify_messages(pdf_names):
+    """
+    构造分类对话的初始消息，静态系统提示词在前，聚类数据在后
+    :param pdf_names: KMeans聚类结果
+    :return: 消息列表
+    """
+    return [
+        {"role": "system", "content": CLASSIFY_SYSTEM_PROMPT},
         {
             "role": "user",
             "content": f"文件名的聚类结果信息：{json.dumps(pdf_names, ensure_ascii=False)}",
         },
     ]
-    response = deepseek_client.chat.completions.create(
-        model="deepseek-chat",
-        messages=messages,
-        response_format={"type": "json_object"},
-    )
-    initial_classification = json.loads(response.choices[0].message.content)
-    messages.append(
-        {
-            "role": "assistant",
-            "content": json.dumps(initial_classification, ensure_ascii=False),
-        }
-    )
-    print("第一轮LLM分类结果：\n", initial_classification)
 
-    # 第二轮：根据第一轮分类结果反思
-    messages.append(
+
+def build_label_messages(groups):
+    """
+    构造上级主题命名请求的消息，只包含各组的子类别名称
+    :param groups: {组序号: [子类别名称, ...]}
+    :return: 消息列表
+    """
+    return [
+        {"role": "system", "content": TOPIC_LABEL_SYSTEM_PROMPT},
         {
             "role": "user",
-            "content": "请反思（Reflection）上述主题分类结果的合理性。"
-            "确保每个有效主题类别至少包含3个标题，并且有效主题类别数量在5到10个之间。"
-            "同时，仔细考虑是否有标题应该被归类为'未分类'。确保所有输入的文件名都得到处理。",
-        }
-    )
-    response = deepseek_client.chat.completions.create(
-        model="deepseek-chat",
+            "content": f"各组的主题类别：{json.dumps(groups, ensure_ascii=False)}",
+        },
+    ]
+
+
+def request_classification(messages, append_reply=True, client=None):
+    """
+    发送一轮分类请求并记录运行指标
+    :param messages: 消息列表
+    :param append_reply: 是否将模型回复原样追加到消息列表，供下一轮作为前缀
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :return: 解析后的JSON结果
+    """
+    client = client or get_deepseek_client()
+    response = run_metrics.timed_call(
+        "classify",
+        client.chat.completions.create,
+        model=CLASSIFY_MODEL,
         messages=messages,
         response_format={"type": "json_object"},
     )
-    second_classification = json.loads(response.choices[0].message.content)
-    messages.append(
-        {
-            "role": "assistant",
-            "content": json.dumps(second_classification, ensure_ascii=False),
-        }
-    )
-    print("第二轮LLM分类结果：\n", second_classification)
+    content = response.choices[0].message.content
+    if append_reply:
+        messages.append({"role": "assistant", "content": content})
+    return json.loads(content)
 
-    # 第三轮优化分类结果
-    messages.append(
-        {
-            "role": "user",
-            "content": "请再次检查一次分类结果，确保所有要求都被满足。特别注意：1) 是否有论文被强行分类到不太合适的类别中？2) 是否有论文的主题与其他论文显著不同？如果有，请将这些论文移至'未分类'列表。确保输出包含'主题分类'和'未分类'两个顶级键，即使'未分类'为空。确保所有输入的文件名都得到处理。",
-        }
-    )
-    response = deepseek_client.chat.completions.create(
-        model="deepseek-chat",
+
+def request_classification_streaming(
+    messages, on_category, append_reply=True, client=None
+):
+    """
+    以流式方式发送一轮分类请求，每个类别的列表一旦生成完毕即回调 on_category，
+    并记录首个类别到达时间与总耗时
+    :param messages: 消息列表
+    :param on_category: 回调函数，参数为 (类别名称, 文件名列表)
+    :param append_reply: 是否将模型回复原样追加到消息列表，供下一轮作为前缀
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :return: 解析后的JSON结果
+    """
+    client = client or get_deepseek_client()
+    start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=CLASSIFY_MODEL,
         messages=messages,
         response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True},
     )
-    final_classification = json.loads(response.choices[0].message.content)
-    messages.append(
-        {
-            "role": "assistant",
-            "content": json.dumps(final_classification, ensure_ascii=False),
-        }
+    parser = IncrementalCategoryParser()
+    parts = []
+    usage_chunk = None
+    time_to_first_category = None
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            usage_chunk = chunk
+        if not chunk.choices:
+            continue
+        text = chunk.choices[0].delta.content or ""
+        parts.append(text)
+        for category, titles in parser.feed(text):
+            if time_to_first_category is None:
+                time_to_first_category = time.perf_counter() - start
+            on_category(category, titles)
+    total_latency = time.perf_counter() - start
+
+    run_metrics.record("classify", usage_chunk, total_latency)
+    run_metrics.record_timing(
+        "classify_stream",
+        time_to_first_category=time_to_first_category or total_latency,
+        total_latency=total_latency,
     )
+    content = "".join(parts)
+    if append_reply:
+        messages.append({"role": "assistant", "content": content})
+    return json.loads(content)
+
+
+def classify_pdfs_with_llm(pdf_names, on_category=None, client=None):
+    """
+    使用大语言模型根据文件名对PDF文件进行多轮分类
+    :param pdf_names: PDF文件名列表
+    :param on_category: 提供时以流式方式执行第三轮（最终）分类，每个类别生成完毕即回调，
+        参数为 (类别名称, 文件名列表)
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :return: 分类结果
+    """
+    client = client or get_deepseek_client()
+    messages = build_classify_messages(pdf_names)
+    initial_classification = request_classification(messages, client=client)
+    print("第一轮LLM分类结果：\n", initial_classification)
+
+    # 第二轮：根据第一轮分类结果反思
+    messages.append({"role": "user", "content": REFLECTION_PROMPT})
+    second_classification = request_classification(messages, client=client)
+    print("第二轮LLM分类结果：\n", second_classification)
+
+    # 第三轮优化分类结果
+    messages.append({"role": "user", "content": FINAL_CHECK_PROMPT})
+    if on_category is None:
+        final_classification = request_classification(messages, client=client)
+    else:
+        final_classification = request_classification_streaming(
+            messages, on_category, client=client
+        )
     print("第三轮LLM分类结果：\n", final_classification)
 
     # 处理"未分类"文献
@@ -128,60 +227,22 @@ def classify_pdfs_with_llm(pdf_names):
         messages.append(
             {
                 "role": "user",
-                "content": f"请对未分类的文献逐步逐步地开展归类，尝试将它们加入到现有主题分类中或创建新的主题分类。未分类文献：{json.dumps(unclassified_papers, ensure_ascii=False)}",
-            }
-        )
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
-        unclassified_classification = json.loads(response.choices[0].message.content)
-        messages.append(
-            {
-                "role": "assistant",
-                "content": json.dumps(unclassified_classification, ensure_ascii=False),
+                "content": UNCLASSIFIED_PROMPT
+                + json.dumps(unclassified_papers, ensure_ascii=False),
             }
         )
+        request_classification(messages, client=client)
         print("继续优化未分类文献的分类")
         # 优化未分类文献的分类
-        messages.append(
-            {
-                "role": "user",
-                "content": "请优化上述未分类文献的分类结果，尽量将它们整合到现有类别中，或在必要时创建新的合适类别。",
-            }
-        )
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
-        optimized_unclassified_classification = json.loads(
-            response.choices[0].message.content
-        )
-        messages.append(
-            {
-                "role": "assistant",
-                "content": json.dumps(
-                    optimized_unclassified_classification, ensure_ascii=False
-                ),
-            }
-        )
+        messages.append({"role": "user", "content": UNCLASSIFIED_OPTIMIZE_PROMPT})
+        optimized_unclassified_classification = request_classification(messages, client=client)
         print("未分类文献的优化分类结果：\n", optimized_unclassified_classification)
 
         # 最终确认未分类文献的分类
-        messages.append(
-            {
-                "role": "user",
-                "content": "请最后检查一次未分类文献的分类结果，确保它们被合理地分类或整合到现有类别中。如果仍有无法分类的文献，请将它们保留在'未分类'类别中。",
-            }
+        messages.append({"role": "user", "content": UNCLASSIFIED_FINAL_PROMPT})
+        final_unclassified_result = request_classification(
+            messages, append_reply=False, client=client
         )
-        response = deepseek_client.chat.completions.create(
-            model="deepseek-chat",
-            messages=messages,
-            response_format={"type": "json_object"},
-        )
-        final_unclassified_result = json.loads(response.choices[0].message.content)
         print("最终未分类文献的分类结果：\n", final_unclassified_result)
         # 整合未分类文献的分类结果到最终分类中
         for category, papers in final_unclassified_result.get("主题分类", {}).items():
@@ -201,62 +262,55 @@ def classify_pdfs_with_llm(pdf_names):
     return final_classification
 
 
-def save_to_cache(data, cache_file):
-    """将预处理数据保存至本地"""
-    with open(cache_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-
-
-def load_from_cache(cache_file):
-    """从本地加载预处理数据"""
-    if os.path.exists(cache_file):
-        with open(cache_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return None
+def move_pdfs_to_category(titles, source_folder, category_path):
+    """
+    将一组PDF文件移动到指定的分类文件夹
+    :param titles: 文件名列表（不含扩展名）
+    :param source_folder: 源文件夹路径
+    :param category_path: 分类文件夹路径
+    """
+    os.makedirs(category_path, exist_ok=True)
+    for title in titles:
+        pdf_filename = title + ".pdf"
+        source_file = os.path.join(source_folder, pdf_filename)
+        destination_file = os.path.join(category_path, pdf_filename)
+        if os.path.exists(source_file):
+            shutil.move(source_file, destination_file)
+            print(f"Moved: {pdf_filename} to {category_path}")
+        else:
+            print(f"File not found: {pdf_filename}")
 
 
 def move_pdfs_to_classified_folders(
     classification_data, source_folder, destination_folder
 ):
     """
-    根据分类结果移动PDF文件到对应的文件夹
+    根据分类结果移动PDF文件到对应的文件夹，嵌套的子分类结果对应嵌套的子文件夹
     :param classification_data: 分类结果数据
     :param source_folder: 源文件夹路径
     :param destination_folder: 目标文件夹路径
     """
     for category, titles in classification_data["主题分类"].items():
         category_path = os.path.join(destination_folder, category)
-        os.makedirs(category_path, exist_ok=True)
-
-        for title in titles:
-            pdf_filename = title + ".pdf"
-            source_file = os.path.join(source_folder, pdf_filename)
-            destination_file = os.path.join(category_path, pdf_filename)
-            if os.path.exists(source_file):
-                shutil.move(source_file, destination_file)
-                print(f"Moved: {pdf_filename} to {category_path}")
-            else:
-                print(f"File not found: {pdf_filename}")
+        if isinstance(titles, dict):
+            move_pdfs_to_classified_folders(titles, source_folder, category_path)
+        else:
+            move_pdfs_to_category(titles, source_folder, category_path)
 
     if "未分类" in classification_data:
         unclassified_path = os.path.join(destination_folder, "未分类")
-        os.makedirs(unclassified_path, exist_ok=True)
-        for title in classification_data["未分类"]:
-            pdf_filename = title + ".pdf"
-            source_file = os.path.join(source_folder, pdf_filename)
-            destination_file = os.path.join(unclassified_path, pdf_filename)
-            if os.path.exists(source_file):
-                shutil.move(source_file, destination_file)
-                print(f"Moved: {pdf_filename} to {unclassified_path}")
-            else:
-                print(f"File not found: {pdf_filename}")
+        move_pdfs_to_category(
+            classification_data["未分类"], source_folder, unclassified_path
+        )
 
 
-def scan_and_move_pdfs_back(source_folder, destination_folder):
+def scan_and_move_pdfs_back(source_folder, destination_folder, store=None):
     """
-    扫描各分类文件夹中的所有PDF文件，然后将其移动到原文件夹
+    扫描各分类文件夹中的所有PDF文件，然后将其移动到原文件夹，
+    并清除缓存的LLM分类结果，使重新运行时重新分类
     :param source_folder: 原文件夹路径
     :param destination_folder: 分类文件夹路径
+    :param store: 阶段产物存储，为None时使用默认存储
     """
     for root, _, files in os.walk(destination_folder):
         for file in files:
@@ -273,6 +327,13 @@ def scan_and_move_pdfs_back(source_folder, destination_folder):
     # 移动完毕后删除空文件夹
     delete_empty_folders(destination_folder)
 
+    # 文件移回后指纹不变，聚类结果可继续复用，但被否定的分类结果不能复用
+    if store is None:
+        store = ArtifactStore()
+    for stage in ("classification", "topic_labels"):
+        store.clear_stage(stage)
+    print("已清除缓存的LLM分类结果，重新运行时将重新分类")
+
 
 def delete_empty_folders(directory):
     """
@@ -287,41 +348,320 @@ def delete_empty_folders(directory):
     print("原分类的空文件夹已经被删除")
 
 
-def process_pdfs_cluster():
+def load_pdf_names_cached(folder, store):
     """
-    处理PDF文件的分类
-    :return:
+    以文件夹指纹为键加载PDF文件名，文件夹内容变化时缓存自动失效
+    :param folder: PDF文件夹路径
+    :param store: 阶段产物存储
+    :return: PDF文件名列表
     """
-    # 查看本地是否有缓存文件，如果有则加载，否则重新加载PDF文件名
-    if not os.path.exists(PDF_NAME_CACHE_FILE):
+    names_key = make_key("pdf_names", fingerprint_folder(folder))
+    pdf_names = store.load_json("pdf_names", names_key)
+    if pdf_names is None:
         print(">> 开始加载PDF文件名")
-        pdf_names = load_pdf_names(FORMATED_PDF_NAME_FOLDER)
-        print(pdf_names)
-        save_to_cache(pdf_names, PDF_NAME_CACHE_FILE)
+        pdf_names = load_pdf_names(folder)
+        store.save_json("pdf_names", names_key, pdf_names)
         print(">> 已将PDF文件名缓存至本地")
     else:
-        print(">> 检测到本地存在可利用的PDF文件名JSON文件，尝试加载")
-        pdf_names = load_pdf_names(PDF_NAME_CACHE_FILE)
-        print(pdf_names)
-
-    # 使用KMeans方法对文献题名进行初步聚类
-    if not os.path.exists("clustered_files.json"):
-        print(">> 预处理：开始使用KMeans方法对文献题名进行初步")
-        preprocess_title_with_kmeans.preprocess_with_kmeans(pdf_names)
-        print(">> 预处理：结束")
-    else:
-        print(">> 预处理：检测到本地存在可利用的聚类结果，尝试加载")
-        kmeans_results = load_from_cache("clustered_files.json")
-        print(">> 预处理：加载聚类结果完成")
+        print(">> 检测到本地存在可利用的PDF文件名缓存，已加载")
+    return pdf_names
+
+
+def classification_key(cluster_key):
+    """根据聚类结果产物键、模型与全部提示词计算分类结果产物键"""
+    return make_key(
+        "classification",
+        cluster_key,
+        model=CLASSIFY_MODEL,
+        prompt=make_key(
+            "prompt",
+            CLASSIFY_SYSTEM_PROMPT,
+            REFLECTION_PROMPT,
+            FINAL_CHECK_PROMPT,
+            UNCLASSIFIED_PROMPT,
+            UNCLASSIFIED_OPTIMIZE_PROMPT,
+            UNCLASSIFIED_FINAL_PROMPT,
+        ),
+    )
+
+
+def classify_pdfs_cached(
+    kmeans_results,
+    cluster_key,
+    store,
+    client=None,
+    stream=False,
+    source_folder=FORMATED_PDF_NAME_FOLDER,
+    destination_folder=PDF_CLASSIFICATION_DIR,
+):
+    """
+    利用LLM分类文献题名，结果按聚类结果与提示词缓存
+    :param kmeans_results: KMeans聚类结果
+    :param cluster_key: 聚类结果产物键
+    :param store: 阶段产物存储
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :param stream: 是否以流式方式执行最终分类轮次，每个类别生成完毕即开始移动文件
+    :param source_folder: 流式模式下移动文件的源文件夹路径
+    :param destination_folder: 流式模式下移动文件的目标文件夹路径
+    :return: (分类结果, 已提前放置的文件名集合)
+    """
+    classify_key = classification_key(cluster_key)
+    llm_classification_results = store.load_json("classification", classify_key)
+    placed_titles = set()
+    if llm_classification_results is not None:
+        print(">> LLM处理：检测到本地存在可利用的分类结果，已加载")
+        return llm_classification_results, placed_titles
 
-    # 利用LLM分类文献题名
     print(">> LLM处理：开始利用LLM分类文献题名")
-    llm_classification_results = classify_pdfs_with_llm(kmeans_results)
+    moves = []
+    if stream:
+        # 后台线程按类别生成顺序移动文件，与模型生成过程重叠
+        with ThreadPoolExecutor(max_workers=1) as executor:
+
+            def place_category(category, titles):
+                future = executor.submit(
+                    move_pdfs_to_category,
+                    titles,
+                    source_folder,
+                    os.path.join(destination_folder, category),
+                )
+                moves.append((titles, future))
+
+            llm_classification_results = classify_pdfs_with_llm(
+                kmeans_results, on_category=place_category, client=client
+            )
+    else:
+        llm_classification_results = classify_pdfs_with_llm(
+            kmeans_results, client=client
+        )
+    store.save_json("classification", classify_key, llm_classification_results)
+    # 移动成功的文件才视为已放置，移动失败时抛出异常
+    for titles, future in moves:
+        future.result()
+        placed_titles.update(titles)
     print(">> LLM处理：利用LLM分类文献题名任务完成！")
+    return llm_classification_results, placed_titles
 
-    # 移动PDF文件到分类文件夹
-    print(">> 移动操作：根据LLM分类结果移动本体PDF文件")
+
+def filter_classification(classification_data, placed_titles):
+    """
+    从（可能嵌套的）分类结果中去除已放置的文件
+    :param classification_data: 分类结果数据
+    :param placed_titles: 已放置的文件名集合
+    :return: 过滤后的分类结果
+    """
+    return {
+        "主题分类": {
+            category: (
+                filter_classification(titles, placed_titles)
+                if isinstance(titles, dict)
+                else [title for title in titles if title not in placed_titles]
+            )
+            for category, titles in classification_data["主题分类"].items()
+        },
+        "未分类": [
+            title
+            for title in classification_data.get("未分类", [])
+            if title not in placed_titles
+        ],
+    }
+
+
+def move_remaining_pdfs(
+    classification_data, source_folder, destination_folder, placed_titles=()
+):
+    """
+    根据分类结果移动PDF文件，跳过流式模式下已提前放置的文件
+    :param classification_data: 分类结果数据
+    :param source_folder: 源文件夹路径
+    :param destination_folder: 目标文件夹路径
+    :param placed_titles: 已放置的文件名集合
+    """
     move_pdfs_to_classified_folders(
-        llm_classification_results, FORMATED_PDF_NAME_FOLDER, PDF_CLASSIFICATION_DIR
+        filter_classification(classification_data, placed_titles),
+        source_folder,
+        destination_folder,
+    )
+
+
+def partition_titles(titles, store, max_category_size, max_clusters=10):
+    """
+    复用TF-IDF/KMeans将文献题名递归划分为若干块，每块不超过 max_category_size 篇
+    :param titles: 文献题名列表
+    :param store: 阶段产物存储
+    :param max_category_size: 每块文献数量上限
+    :param max_clusters: 每次划分的KMeans最大聚类数量
+    :return: 文献题名块列表
+    """
+    if len(titles) <= max_category_size:
+        return [titles]
+    clusters, _ = preprocess_title_with_kmeans.preprocess_with_kmeans(
+        titles, max_clusters=min(max_clusters, len(titles)), store=store, plot_path=None
+    )
+    chunks = []
+    for cluster_titles in clusters.values():
+        if len(cluster_titles) == len(titles):
+            # KMeans无法继续划分（如题名几乎相同），按顺序切分
+            chunks.extend(
+                titles[start : start + max_category_size]
+                for start in range(0, len(titles), max_category_size)
+            )
+        elif cluster_titles:
+            chunks.extend(
+                partition_titles(cluster_titles, store, max_category_size, max_clusters)
+            )
+    return chunks
+
+
+def classify_chunk(titles, store, client=None, max_clusters=10):
+    """
+    对一块文献题名进行聚类与多轮分类，结果按聚类结果与提示词缓存
+    :param titles: 文献题名列表
+    :param store: 阶段产物存储
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :param max_clusters: KMeans最大聚类数量
+    :return: 分类结果，模型遗漏的文献放入"未分类"
+    """
+    clusters, cluster_key = preprocess_title_with_kmeans.preprocess_with_kmeans(
+        titles, max_clusters=min(max_clusters, len(titles)), store=store, plot_path=None
+    )
+    classification, _ = classify_pdfs_cached(clusters, cluster_key, store, client=client)
+    # 模型遗漏的文献保留在"未分类"中，避免文件丢失
+    covered = {
+        title
+        for category_titles in classification["主题分类"].values()
+        for title in category_titles
+    }
+    covered.update(classification.get("未分类", []))
+    classification.setdefault("未分类", []).extend(
+        title for title in titles if title not in covered
+    )
+    return classification
+
+
+def merge_classifications(results):
+    """
+    合并多个分类结果，同名类别的文献合并到同一类别
+    :param results: 分类结果列表
+    :return: 合并后的分类结果
+    """
+    merged = {"主题分类": {}, "未分类": []}
+    for result in results:
+        for category, titles in result["主题分类"].items():
+            merged["主题分类"].setdefault(category, []).extend(titles)
+        merged["未分类"].extend(result.get("未分类", []))
+    return merged
+
+
+def label_topic_groups(groups, store, client=None):
+    """
+    根据各组的子类别名称生成上级主题名称，结果按输入与提示词缓存
+    :param groups: {组序号: [子类别名称, ...]}
+    :param store: 阶段产物存储
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :return: {组序号: 上级主题名称}，名称缺失、重复或为"未分类"时使用"主题<组序号>"
+    """
+    labels_key = make_key(
+        "topic_labels",
+        groups,
+        model=CLASSIFY_MODEL,
+        prompt=make_key("prompt", TOPIC_LABEL_SYSTEM_PROMPT),
+    )
+    labels = store.load_json("topic_labels", labels_key)
+    if labels is None:
+        client = client or get_deepseek_client()
+        response = run_metrics.timed_call(
+            "topic_labels",
+            client.chat.completions.create,
+            model=CLASSIFY_MODEL,
+            messages=build_label_messages(groups),
+            response_format={"type": "json_object"},
+        )
+        labels = json.loads(response.choices[0].message.content)
+        store.save_json("topic_labels", labels_key, labels)
+
+    result = {}
+    # "未分类"为顶层保留文件夹，上级主题不能与之同名
+    used = {"未分类"}
+    for group in groups:
+        label = labels.get(group)
+        label = label.strip() if isinstance(label, str) else ""
+        if not label or label in used:
+            label = f"主题{group}"
+            suffix = 2
+            while label in used:
+                label = f"主题{group}_{suffix}"
+                suffix += 1
+        used.add(label)
+        result[group] = label
+    return result
+
+
+def build_topic_tree(
+    pdf_names,
+    store,
+    client=None,
+    max_category_size=100,
+    max_clusters=10,
+    max_workers=4,
+):
+    """
+    生成两级主题树，每次LLM分类调用处理的文献数量不超过 max_category_size：
+    1. 复用TF-IDF/KMeans将全部文献划分为若干主题组，超过阈值的组继续划分为多个块；
+    2. 各块并行地进行多轮分类，同一主题组内各块的同名类别合并为该组的子类别；
+    3. 仅将各组的子类别名称交给LLM，概括为上级主题名称。
+    文献总数不超过阈值时直接分类，不生成上级主题。
+    :param pdf_names: PDF文件名列表
+    :param store: 阶段产物存储
+    :param client: LLM客户端，为None时使用进程内共享的客户端
+    :param max_category_size: 单次分类调用的文献数量上限
+    :param max_clusters: KMeans最大聚类数量
+    :param max_workers: 并行分类的数量
+    :return: 主题树，上级主题的值为嵌套的分类结果
+    """
+    if len(pdf_names) <= max_category_size:
+        return classify_chunk(pdf_names, store, client=client, max_clusters=max_clusters)
+
+    groups, _ = preprocess_title_with_kmeans.preprocess_with_kmeans(
+        pdf_names,
+        max_clusters=min(max_clusters, len(pdf_names)),
+        store=store,
+        plot_path=None,
+    )
+    jobs = [
+        (str(group), chunk)
+        for group, titles in groups.items()
+        if titles
+        for chunk in partition_titles(titles, store, max_category_size, max_clusters)
+    ]
+    print(f">> 主题树：{len(pdf_names)} 篇文献划分为 {len(jobs)} 个分类块")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(
+            executor.map(
+                lambda job: classify_chunk(
+                    job[1], store, client=client, max_clusters=max_clusters
+                ),
+                jobs,
+            )
+        )
+
+    group_results = {}
+    for (group, _), result in zip(jobs, results):
+        group_results.setdefault(group, []).append(result)
+    group_results = {
+        group: merge_classifications(results)
+        for group, results in group_results.items()
+    }
+    if len(group_results) == 1:
+        return next(iter(group_results.values()))
+
+    labels = label_topic_groups(
+        {group: list(result["主题分类"]) for group, result in group_results.items()},
+        store,
+        client=client,
     )
-    print(">> 移动操作：完成")
+    return {
+        "主题分类": {labels[group]: result for group, result in group_results.items()},
+        "未分类": [],
+    }
@@ -18,6 +18,8 @@ import os
 import re
 import logging
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from langchain_community.document_loaders import (
     PDFPlumberLoader,
@@ -25,7 +27,9 @@ from langchain_community.document_loaders import (
 
 from custom_exception import CopyException, MoveException
 from fix_pdf_title_with_llm import get_paper_title_with_deepseek
+from llm_metrics import run_metrics
 from load_pdf import get_paper_title_with_regx
+from work_queue import Heartbeat, LeaseQueue, default_worker_id
 
 # 设置日志
 logging.basicConfig(
@@ -61,6 +65,25 @@ def load_pdf_content(file_path):
     return ""
 
 
+def load_first_page_text(file_path, max_chars=1000):
+    """
+    提取PDF文件首页的文本内容，仅解析第一页。
+
+    Args:
+        file_path (str): PDF文件路径。
+        max_chars (int): 返回文本的最大长度。
+
+    Returns:
+        str: 首页文本，无法解析时返回空字符串。
+    """
+    try:
+        for document in PDFPlumberLoader(file_path).lazy_load():
+            return document.page_content[:max_chars]
+    except Exception as e:
+        logging.error("提取首页文本时出错 %s: %s", file_path, str(e))
+    return ""
+
+
 def sanitize_filename(filename):
     """
     清理文件名，移除非法字符。
@@ -111,13 +134,14 @@ def is_filename_valid(filename):
     return re.match(r"^\d+_.*\.pdf$", filename)
 
 
-def process_filename(filename, file_path):
+def process_filename(filename, file_path, client=None):
     """
     处理文件名，根据不同情况进行相应的处理。
 
     Args:
         filename (str): 原始文件名。
         file_path (str): 文件路径。
+        client: LLM客户端，为None时使用进程内共享的客户端。
 
     Returns:
         str: 处理后的文件名，如果无法处理返回None。
@@ -127,7 +151,9 @@ def process_filename(filename, file_path):
         if processed_name is None:
             pdf_text = load_pdf_content(file_path)
             original_title = os.path.splitext(filename)[0]
-            paper_title = get_paper_title_with_deepseek(pdf_text, original_title)
+            paper_title = get_paper_title_with_deepseek(
+                pdf_text, original_title, client=client
+            )
             if paper_title:
                 return sanitize_filename(paper_title) + ".pdf"
             logging.warning("无法提取标题 %s", filename)
@@ -142,32 +168,47 @@ def process_filename(filename, file_path):
         return None
 
 
-def rename_pdf_files(folder_path, output_path):
+def rename_pdf_files(folder_path, output_path, client=None, max_workers=1):
     """
     重命名指定文件夹中的PDF文件。
 
     Args:
         folder_path (str): 输入文件夹路径。
         output_path (str): 输出文件夹路径。
+        client: LLM客户端，为None时使用进程内共享的客户端。
+        max_workers (int): 同时处理的文件数量，大于1时并发调用LLM补全标题。
+
+    Returns:
+        list: 本次写入输出文件夹的文件名。
     """
     create_output_directory(output_path)
-    for filename in os.listdir(folder_path):
+
+    def rename_one(filename):
         file_path = os.path.join(folder_path, filename)
-        if is_valid_pdf(filename):
-            try:
-                if is_filename_valid(filename):
-                    logging.info("文件名已符合要求，直接移动: %s", filename)
-                    new_file_path = os.path.join(output_path, filename)
-                    move_file(file_path, new_file_path)
-                else:
-                    new_filename = process_filename(filename, file_path)
-                    if new_filename:
-                        new_file_path = os.path.join(output_path, new_filename)
-                        copy_file(file_path, new_file_path)
-                    else:
-                        logging.warning("无法处理文件: %s", filename)
-            except Exception as e:
-                logging.error("处理文件时出错 %s: %s", filename, str(e))
+        try:
+            if is_filename_valid(filename):
+                logging.info("文件名已符合要求，直接移动: %s", filename)
+                new_file_path = os.path.join(output_path, filename)
+                move_file(file_path, new_file_path)
+                return filename
+            new_filename = process_filename(filename, file_path, client=client)
+            if new_filename:
+                new_file_path = os.path.join(output_path, new_filename)
+                copy_file(file_path, new_file_path)
+                return new_filename
+            logging.warning("无法处理文件: %s", filename)
+        except Exception as e:
+            logging.error("处理文件时出错 %s: %s", filename, str(e))
+        return None
+
+    filenames = [name for name in os.listdir(folder_path) if is_valid_pdf(name)]
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(rename_one, filenames))
+    else:
+        results = [rename_one(filename) for filename in filenames]
+    run_metrics.log_summary()
+    return [filename for filename in results if filename]
 
 
 def move_file(file_path, new_file_path):
@@ -206,3 +247,133 @@ def copy_file(file_path, new_file_path):
             logging.warning("目标文件已存在，跳过复制: %s", new_file_path)
     except CopyException as e:
         logging.error("复制文件时出错 %s: %s", file_path, str(e))
+
+
+def place_file_unique(file_path, output_path, filename, move=False):
+    """
+    将文件复制（或移动）到输出目录，文件名冲突时追加序号，多节点并发写入时不会互相覆盖。
+
+    Args:
+        file_path (str): 原始文件路径。
+        output_path (str): 输出目录路径。
+        filename (str): 目标文件名。
+        move (bool): 是否在放置完成后删除原始文件。
+
+    Returns:
+        str: 最终的目标文件路径。
+    """
+    create_output_directory(output_path)
+    base, ext = os.path.splitext(filename)
+    tmp_path = os.path.join(output_path, f".{filename}.{default_worker_id()}.tmp")
+    shutil.copy2(file_path, tmp_path)
+    try:
+        index = 1
+        while True:
+            candidate = filename if index == 1 else f"{base}_{index}{ext}"
+            new_file_path = os.path.join(output_path, candidate)
+            try:
+                # 硬链接在目标已存在时失败，保证名称的独占分配
+                os.link(tmp_path, new_file_path)
+                break
+            except FileExistsError:
+                index += 1
+    finally:
+        os.remove(tmp_path)
+    if move:
+        os.remove(file_path)
+    return new_file_path
+
+
+def enqueue_pdf_files(folder_path, queue_dir):
+    """
+    将文件夹中的PDF文件加入共享任务队列，已在队列中的文件不会重复加入。
+
+    Args:
+        folder_path (str): 输入文件夹路径。
+        queue_dir (str): 共享队列目录。
+
+    Returns:
+        int: 新加入的任务数量。
+    """
+    queue = LeaseQueue(queue_dir)
+    added = sum(
+        queue.enqueue(filename)
+        for filename in sorted(os.listdir(folder_path))
+        if is_valid_pdf(filename)
+    )
+    logging.info("已加入 %d 个任务，队列状态: %s", added, queue.counts())
+    return added
+
+
+def rename_pdf_worker(
+    folder_path,
+    output_path,
+    queue_dir,
+    lease_seconds=300,
+    poll_seconds=5,
+    client=None,
+):
+    """
+    以工作节点模式运行 rename_pdf_files：从共享队列领取文件，完成标题修复与文本提取，
+    并将结果合并到同一输出文件夹。队列中没有待处理和已领取的任务时退出。
+
+    Args:
+        folder_path (str): 输入文件夹路径（各节点共享）。
+        output_path (str): 输出文件夹路径（各节点共享）。
+        queue_dir (str): 共享队列目录。
+        lease_seconds (int): 租约时长（秒），超过该时长未心跳的任务会被回收。
+        poll_seconds (int): 暂无可领取任务时的轮询间隔（秒）。
+        client: LLM客户端，为None时使用进程内共享的客户端。
+
+    Returns:
+        int: 本节点处理完成的任务数量。
+    """
+    queue = LeaseQueue(queue_dir, lease_seconds=lease_seconds)
+    processed = 0
+    while True:
+        queue.reclaim_expired()
+        item_id, item = queue.claim()
+        if item_id is None:
+            counts = queue.counts()
+            if counts["pending"] == 0 and counts["leased"] == 0:
+                break
+            time.sleep(poll_seconds)
+            continue
+
+        filename = item["key"]
+        file_path = os.path.join(folder_path, filename)
+        try:
+            move = bool(is_filename_valid(filename))
+            if not move and (
+                get_paper_title_with_regx(filename) == os.path.splitext(filename)[0]
+            ):
+                # 与 rename_pdf_files 一致，process_filename 会跳过此类文件，直接标记完成
+                logging.info("跳过: %s", filename)
+                queue.complete(item_id, {"output": None, "skipped": True})
+                processed += 1
+                continue
+            with Heartbeat(queue, item_id):
+                new_filename = (
+                    filename
+                    if move
+                    else process_filename(filename, file_path, client=client)
+                )
+                if not new_filename:
+                    # 标题修复或文本提取失败（如API错误），交由队列重试
+                    raise RuntimeError(f"无法处理文件: {filename}")
+                new_file_path = None
+                # 租约被回收后其他节点可能已完成该任务，此时不再重复放置文件
+                if not queue.is_done(item_id):
+                    new_file_path = place_file_unique(
+                        file_path, output_path, new_filename, move=move
+                    )
+                    logging.info("成功处理: %s -> %s", file_path, new_file_path)
+            queue.complete(item_id, {"output": new_file_path})
+            processed += 1
+        except Exception as e:
+            logging.error("处理文件时出错 %s: %s", filename, str(e))
+            queue.fail(item_id, str(e))
+
+    run_metrics.log_summary()
+    logging.info("工作节点 %s 退出，共处理 %d 个任务", queue.worker_id, processed)
+    return processed
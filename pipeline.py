@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""进程内可复用的流水线对象
+
+Pipeline 持有一组文件夹配置，以及可在多个流水线之间共享的资源：LLM客户端、
+阶段产物存储（缓存）与聚类参数。一个常驻进程可以依次或并发地处理多个文献库，
+无需为每个文件夹重新启动进程、重新导入依赖或重新创建HTTP客户端。
+
+使用示例：
+    base = Pipeline()
+    pipelines = [base.with_folders(src, fmt, cls) for src, fmt, cls in libraries]
+    run_pipelines(pipelines, max_workers=4)
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from add_prefix_to_pdf import STATE_FILE as PREFIX_STATE_FILE, add_prefix_to_pdf
+from artifact_store import ArtifactStore, make_key
+from config import FORMATED_PDF_NAME_FOLDER, PDF_CLASSIFICATION_DIR, SOURCE_PDF_FOLDER
+from llm_client import get_deepseek_client
+from llm_metrics import run_metrics
+from pdf_classify import (
+    build_topic_tree,
+    classify_pdfs_cached,
+    load_pdf_names_cached,
+    move_remaining_pdfs,
+)
+from pdf_name_normalize import rename_pdf_files
+from preprocess_title_with_kmeans import preprocess_with_kmeans
+
+
+class Pipeline:
+    """PDF规范化、聚类、分类与整理流水线"""
+
+    def __init__(
+        self,
+        source_folder=SOURCE_PDF_FOLDER,
+        formatted_folder=FORMATED_PDF_NAME_FOLDER,
+        classification_dir=PDF_CLASSIFICATION_DIR,
+        client=None,
+        store=None,
+        max_clusters=10,
+        concurrency=1,
+    ):
+        """
+        Args:
+            source_folder (str): PDF原始文件夹。
+            formatted_folder (str): 规范化PDF文件名文件夹。
+            classification_dir (str): PDF分类文件夹。
+            client: LLM客户端，为None时在首次调用LLM时使用进程内共享的客户端。
+            store (ArtifactStore): 阶段产物存储，为None时使用默认存储。
+            max_clusters (int): KMeans最大聚类数量。
+            concurrency (int): LLM调用并发数，用于标题补全与主题树各块的分类。
+        """
+        self.source_folder = source_folder
+        self.formatted_folder = formatted_folder
+        self.classification_dir = classification_dir
+        self._client = client
+        self.store = store or ArtifactStore()
+        self.max_clusters = max_clusters
+        self.concurrency = concurrency
+
+    @property
+    def client(self):
+        """LLM客户端，仅在需要调用LLM时创建，只做聚类或整理时无需配置API密钥"""
+        return self._client or get_deepseek_client()
+
+    def with_folders(self, source_folder, formatted_folder, classification_dir):
+        """返回处理另一组文件夹、但共享客户端与缓存的新流水线"""
+        return Pipeline(
+            source_folder,
+            formatted_folder,
+            classification_dir,
+            client=self._client,
+            store=self.store,
+            max_clusters=self.max_clusters,
+            concurrency=self.concurrency,
+        )
+
+    def normalize(self):
+        """规范化命名PDF文件，返回本次写入规范化文件夹的文件名"""
+        return rename_pdf_files(
+            self.source_folder,
+            self.formatted_folder,
+            client=self._client,
+            max_workers=self.concurrency,
+        )
+
+    def prefix(self, new_files=None):
+        """为PDF文件添加序号前缀，提供 new_files 时只处理这些文件"""
+        add_prefix_to_pdf(self.formatted_folder, new_files=new_files)
+
+    def cluster(self):
+        """
+        借助KMeans对PDF文件名进行初步聚类。
+
+        Returns:
+            tuple: (聚类结果字典, 聚类结果产物键)。
+        """
+        pdf_names = load_pdf_names_cached(self.formatted_folder, self.store)
+        return preprocess_with_kmeans(
+            pdf_names,
+            max_clusters=self.max_clusters,
+            store=self.store,
+            plot_path=self.plot_path(),
+        )
+
+    def plot_path(self):
+        """肘部法则图的保存路径，位于产物存储下，按规范化文件夹区分，不写入分类文件夹"""
+        plot_dir = os.path.join(self.store.root, "plots")
+        os.makedirs(plot_dir, exist_ok=True)
+        folder_key = make_key("plot", os.path.abspath(self.formatted_folder))
+        return os.path.join(plot_dir, f"elbow_method_{folder_key[:16]}.png")
+
+    def classify(self, clusters, cluster_key, stream=False):
+        """
+        借助LLM参考聚类结果进行主题分类。
+
+        Args:
+            clusters (dict): 聚类结果字典。
+            cluster_key (str): 聚类结果产物键。
+            stream (bool): 是否以流式方式执行最终分类轮次并提前放置文件。
+
+        Returns:
+            tuple: (分类结果, 已提前放置的文件名集合)。
+        """
+        return classify_pdfs_cached(
+            clusters,
+            cluster_key,
+            self.store,
+            client=self._client,
+            stream=stream,
+            source_folder=self.formatted_folder,
+            destination_folder=self.classification_dir,
+        )
+
+    def topic_tree(self, max_category_size=100, max_workers=None):
+        """
+        生成两级主题树，全部文献先按聚类划分为不超过阈值的块再并行分类，
+        每次LLM分类调用处理的文献数量不超过 max_category_size。
+
+        Args:
+            max_category_size (int): 单次分类调用的文献数量上限。
+            max_workers (int): 并行分类的数量，为None时使用流水线的并发数。
+
+        Returns:
+            dict: 主题树。
+        """
+        pdf_names = load_pdf_names_cached(self.formatted_folder, self.store)
+        return build_topic_tree(
+            pdf_names,
+            self.store,
+            client=self._client,
+            max_category_size=max_category_size,
+            max_clusters=self.max_clusters,
+            max_workers=max_workers or self.concurrency,
+        )
+
+    def place(self, classification, placed_titles=()):
+        """根据分类结果将PDF文件移动到分类文件夹，跳过已放置的文件"""
+        move_remaining_pdfs(
+            classification,
+            self.formatted_folder,
+            self.classification_dir,
+            placed_titles,
+        )
+
+    def organize(self, stream=False, max_category_size=None):
+        """
+        对规范化文件夹中的PDF文件依次执行聚类、分类、细分与整理。
+
+        Args:
+            stream (bool): 是否以流式方式执行最终分类轮次并提前放置文件。
+            max_category_size (int): 提供时生成两级主题树，每次分类调用的文献数量不超过该值。
+
+        Returns:
+            dict: 分类结果。
+        """
+        if max_category_size:
+            # 主题树模式下各块分类结果需合并后才能确定文件夹，不提前放置
+            classification, placed_titles = self.topic_tree(max_category_size), ()
+        else:
+            clusters, cluster_key = self.cluster()
+            classification, placed_titles = self.classify(
+                clusters, cluster_key, stream=stream
+            )
+        self.place(classification, placed_titles)
+        return classification
+
+    def run(self, stream=False, max_category_size=None):
+        """
+        依次执行完整流水线。
+
+        Args:
+            stream (bool): 是否以流式方式执行最终分类轮次并提前放置文件。
+            max_category_size (int): 提供时生成两级主题树，每次分类调用的文献数量不超过该值。
+
+        Returns:
+            dict: 分类结果。
+        """
+        logging.info("开始处理文献库: %s", self.source_folder)
+        new_files = self.normalize()
+        # 序号分配器已初始化时只需处理新文件，否则扫描整个文件夹
+        allocator_ready = os.path.exists(
+            os.path.join(self.formatted_folder, PREFIX_STATE_FILE)
+        )
+        self.prefix(new_files if allocator_ready else None)
+        classification = self.organize(stream, max_category_size)
+        logging.info("文献库处理完成: %s", self.source_folder)
+        return classification
+
+
+def run_pipelines(pipelines, max_workers=4, stream=False, max_category_size=None):
+    """
+    在同一进程中并发运行多个流水线。
+
+    Args:
+        pipelines (list): Pipeline 列表，通常由同一个流水线的 with_folders 创建。
+        max_workers (int): 并发数量。
+        stream (bool): 是否以流式方式执行最终分类轮次。
+        max_category_size (int): 提供时生成两级主题树。
+
+    Returns:
+        list: 各流水线的分类结果，顺序与输入一致。
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                lambda p: p.run(stream=stream, max_category_size=max_category_size),
+                pipelines,
+            )
+        )
+
+
+def process_pdfs_cluster(store=None, stream=False, max_category_size=None):
+    """
+    使用默认文件夹配置对规范化文件夹中的PDF文件进行聚类、分类与整理，
+    各阶段产物按输入哈希缓存，命中时跳过该阶段。
+
+    Args:
+        store (ArtifactStore): 阶段产物存储，为None时使用默认存储。
+        stream (bool): 是否以流式方式执行最终分类轮次，每个类别生成完毕即开始移动文件。
+        max_category_size (int): 提供时生成两级主题树，每次分类调用的文献数量不超过该值。
+
+    Returns:
+        dict: 分类结果。
+    """
+    classification = Pipeline(store=store).organize(stream, max_category_size)
+    run_metrics.log_summary()
+    return classification
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""流水线预估（dry-run）模块
+
+在不调用任何API的前提下，扫描PDF文件夹并估算完整运行所需的LLM调用次数、
+token数量、费用与耗时：
+
+1. 使用 get_paper_title_with_regx 统计需要LLM补全标题的文件数量。
+2. 基于实际的提示词模板构造请求消息，使用本地近似分词规则估算token数。
+3. 按多轮分类对话的消息增长方式估算每一轮的提示词与输出token数；
+   主题树模式下按分块数量估算各块的分类轮次与上级主题命名调用。
+4. 按给定并发数与吞吐参数推算总耗时。
+"""
+import json
+import math
+import os
+import re
+
+from fix_pdf_title_with_llm import build_title_messages
+from load_pdf import get_paper_title_with_regx
+from pdf_classify import (
+    FINAL_CHECK_PROMPT,
+    REFLECTION_PROMPT,
+    UNCLASSIFIED_FINAL_PROMPT,
+    UNCLASSIFIED_OPTIMIZE_PROMPT,
+    UNCLASSIFIED_PROMPT,
+    build_classify_messages,
+    build_label_messages,
+)
+
+# 近似分词参数：中文字符约0.6个token，ASCII字符约3.5个字符一个token
+CJK_TOKENS_PER_CHAR = 0.6
+ASCII_CHARS_PER_TOKEN = 3.5
+OTHER_TOKENS_PER_CHAR = 1.0
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# load_pdf_content 截取的文本长度，预估时以同等长度的占位文本代替
+PDF_TEXT_CHARS = 250
+# 预估的KMeans聚类数量与未分类文献比例
+ESTIMATED_CLUSTERS = 10
+ESTIMATED_CATEGORIES = 10
+ESTIMATED_UNCLASSIFIED_RATIO = 0.1
+
+# 默认单价（元/百万token）与吞吐参数，可通过参数覆盖
+DEFAULT_PRICING = {"input_miss": 1.0, "input_hit": 0.1, "output": 2.0}
+DEFAULT_FIRST_TOKEN_SECONDS = 1.5
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 30.0
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """
+    使用本地近似规则估算文本的token数量。
+
+    Args:
+        text (str): 文本内容。
+
+    Returns:
+        int: 估算的token数量。
+    """
+    cjk = len(_CJK_PATTERN.findall(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128 and not ch.isspace())
+    other = len(text) - cjk - ascii_chars - sum(1 for ch in text if ch.isspace())
+    return math.ceil(
+        cjk * CJK_TOKENS_PER_CHAR
+        + ascii_chars / ASCII_CHARS_PER_TOKEN
+        + max(other, 0) * OTHER_TOKENS_PER_CHAR
+    )
+
+
+def estimate_message_tokens(messages):
+    """估算消息列表作为提示词时的token数量"""
+    return sum(
+        estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        for message in messages
+    )
+
+
+def call_seconds(completion_tokens, first_token_seconds, output_tokens_per_second):
+    """估算单次调用耗时"""
+    return first_token_seconds + completion_tokens / output_tokens_per_second
+
+
+def scan_folder(folder_path):
+    """
+    扫描文件夹，区分需要LLM补全标题的文件与可直接处理的文件。
+
+    Args:
+        folder_path (str): PDF文件夹路径。
+
+    Returns:
+        tuple: (需要LLM补全的原始标题列表, 预估的规范化文件名列表)。
+    """
+    needs_llm = []
+    normalized = []
+    for filename in sorted(os.listdir(folder_path)):
+        if not filename.lower().endswith(".pdf"):
+            continue
+        processed_name = get_paper_title_with_regx(filename)
+        if processed_name is None:
+            original_title = os.path.splitext(filename)[0]
+            needs_llm.append(original_title)
+            # 补全后的标题长度以原始标题长度近似
+            normalized.append(original_title.replace("...", ""))
+        else:
+            normalized.append(processed_name)
+    return needs_llm, normalized
+
+
+def plan_title_fix(needs_llm):
+    """
+    估算标题补全阶段的token数量。
+
+    Args:
+        needs_llm (list): 需要LLM补全的原始标题列表。
+
+    Returns:
+        dict: 调用次数、提示词token数、缓存前缀token数、输出token数与单次调用输出token列表。
+    """
+    placeholder_text = "文" * PDF_TEXT_CHARS
+    prompt_tokens = 0
+    cached_tokens = 0
+    completion = []
+    for original_title in needs_llm:
+        messages = build_title_messages(placeholder_text, original_title)
+        prompt_tokens += estimate_message_tokens(messages)
+        cached_tokens += estimate_message_tokens(messages[:1])
+        completion.append(
+            estimate_tokens(json.dumps({"title": original_title}, ensure_ascii=False))
+        )
+    return {
+        "calls": len(needs_llm),
+        "prompt_tokens": prompt_tokens,
+        "prompt_cache_hit_tokens": cached_tokens,
+        "completion_tokens": sum(completion),
+        "_completion_per_call": completion,
+    }
+
+
+def prefix_names(normalized):
+    """按序号前缀规则生成预估的带序号文件名"""
+    width = max(len(str(len(normalized))), 2)
+    return [
+        f"{str(index).zfill(width)}_{name}"
+        for index, name in enumerate(normalized, start=1)
+    ]
+
+
+def plan_classification(names):
+    """
+    按多轮分类对话的消息增长方式，估算每一轮的token数量。
+
+    Args:
+        names (list): 预估的带序号文件名列表。
+
+    Returns:
+        list: 每一轮的估算结果字典。
+    """
+    clusters = {i: names[i::ESTIMATED_CLUSTERS] for i in range(ESTIMATED_CLUSTERS)}
+    categories = {
+        f"类别{i}": names[i::ESTIMATED_CATEGORIES] for i in range(ESTIMATED_CATEGORIES)
+    }
+    unclassified = names[: int(len(names) * ESTIMATED_UNCLASSIFIED_RATIO)]
+    full_reply = json.dumps(
+        {"主题分类": categories, "未分类": unclassified}, ensure_ascii=False
+    )
+    partial_reply = json.dumps(
+        {"主题分类": {"类别0": unclassified}, "未分类": []}, ensure_ascii=False
+    )
+
+    rounds = [
+        ("initial", None, full_reply),
+        ("reflection", REFLECTION_PROMPT, full_reply),
+        ("final_check", FINAL_CHECK_PROMPT, full_reply),
+    ]
+    if unclassified:
+        rounds += [
+            (
+                "unclassified",
+                UNCLASSIFIED_PROMPT + json.dumps(unclassified, ensure_ascii=False),
+                partial_reply,
+            ),
+            ("unclassified_optimize", UNCLASSIFIED_OPTIMIZE_PROMPT, partial_reply),
+            ("unclassified_final", UNCLASSIFIED_FINAL_PROMPT, partial_reply),
+        ]
+
+    messages = build_classify_messages(clusters)
+    results = []
+    previous_prompt_tokens = 0
+    for name, instruction, reply in rounds:
+        if instruction is not None:
+            messages.append({"role": "user", "content": instruction})
+        prompt_tokens = estimate_message_tokens(messages)
+        results.append(
+            {
+                "round": name,
+                "calls": 1,
+                "prompt_tokens": prompt_tokens,
+                # 后一轮以前一轮的完整提示词为前缀
+                "prompt_cache_hit_tokens": previous_prompt_tokens,
+                "completion_tokens": estimate_tokens(reply),
+            }
+        )
+        previous_prompt_tokens = prompt_tokens
+        messages.append({"role": "assistant", "content": reply})
+    return results
+
+
+def plan_topic_tree(names, max_category_size):
+    """
+    估算主题树模式的分类调用：文献按聚类划分为不超过阈值的块，各块独立进行多轮分类，
+    最后一次调用根据子类别名称为各主题组命名。实际划分的块数可能多于按阈值均分的块数。
+
+    Args:
+        names (list): 预估的带序号文件名列表。
+        max_category_size (int): 单次分类调用的文献数量上限。
+
+    Returns:
+        tuple: (各块的轮次估算结果列表, 上级主题命名调用的估算结果)。
+    """
+    chunk_rounds = [
+        plan_classification(names[start : start + max_category_size])
+        for start in range(0, len(names), max_category_size)
+    ]
+    groups = {
+        str(group): [f"类别{i}" for i in range(ESTIMATED_CATEGORIES)]
+        for group in range(min(ESTIMATED_CLUSTERS, len(chunk_rounds)))
+    }
+    reply = json.dumps({group: f"主题{group}" for group in groups}, ensure_ascii=False)
+    label_round = {
+        "round": "topic_labels",
+        "calls": 1,
+        "prompt_tokens": estimate_message_tokens(build_label_messages(groups)),
+        "prompt_cache_hit_tokens": 0,
+        "completion_tokens": estimate_tokens(reply),
+    }
+    return chunk_rounds, label_round
+
+
+def sum_rounds(chunk_rounds):
+    """将各块同名轮次的估算结果累加"""
+    totals = {}
+    for rounds in chunk_rounds:
+        for item in rounds:
+            total = totals.setdefault(
+                item["round"],
+                {
+                    "round": item["round"],
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "prompt_cache_hit_tokens": 0,
+                    "completion_tokens": 0,
+                },
+            )
+            for field in (
+                "calls",
+                "prompt_tokens",
+                "prompt_cache_hit_tokens",
+                "completion_tokens",
+            ):
+                total[field] += item[field]
+    return list(totals.values())
+
+
+def estimate_cost(prompt_tokens, cached_tokens, completion_tokens, pricing):
+    """按单价估算费用"""
+    miss_tokens = prompt_tokens - cached_tokens
+    return (
+        miss_tokens * pricing["input_miss"]
+        + cached_tokens * pricing["input_hit"]
+        + completion_tokens * pricing["output"]
+    ) / 1_000_000
+
+
+def plan_pipeline(
+    folder_path,
+    concurrency=1,
+    pricing=None,
+    first_token_seconds=DEFAULT_FIRST_TOKEN_SECONDS,
+    output_tokens_per_second=DEFAULT_OUTPUT_TOKENS_PER_SECOND,
+    max_category_size=None,
+):
+    """
+    估算对指定文件夹运行完整流水线的调用次数、token、费用与耗时，不调用任何API。
+
+    Args:
+        folder_path (str): PDF原始文件夹路径。
+        concurrency (int): 标题补全阶段与主题树各块分类的并发数，与实际运行时 main.py 的 --concurrency 一致。
+        pricing (dict): 单价（元/百万token），键为 input_miss/input_hit/output。
+        first_token_seconds (float): 单次调用的首token延迟（秒）。
+        output_tokens_per_second (float): 输出吞吐（token/秒）。
+        max_category_size (int): 提供时按主题树模式估算，每次分类调用的文献数量不超过该值。
+
+    Returns:
+        dict: 预估报告。
+    """
+    pricing = pricing or DEFAULT_PRICING
+    needs_llm, normalized = scan_folder(folder_path)
+
+    title_fix = plan_title_fix(needs_llm)
+    completion_per_call = title_fix.pop("_completion_per_call")
+    # 按并发数将调用分批，每批耗时取决于批内最慢的调用
+    title_seconds = 0.0
+    for start in range(0, len(completion_per_call), max(concurrency, 1)):
+        batch = completion_per_call[start : start + max(concurrency, 1)]
+        title_seconds += call_seconds(
+            max(batch), first_token_seconds, output_tokens_per_second
+        )
+    title_fix["cost"] = round(
+        estimate_cost(
+            title_fix["prompt_tokens"],
+            title_fix["prompt_cache_hit_tokens"],
+            title_fix["completion_tokens"],
+            pricing,
+        ),
+        4,
+    )
+    title_fix["minutes"] = round(title_seconds / 60, 2)
+
+    names = prefix_names(normalized)
+    if max_category_size and len(names) > max_category_size:
+        chunk_rounds, label_round = plan_topic_tree(names, max_category_size)
+        rounds = sum_rounds(chunk_rounds) + [label_round]
+    else:
+        chunk_rounds = [plan_classification(names)] if names else []
+        label_round = None
+        rounds = chunk_rounds[0] if chunk_rounds else []
+
+    for item in rounds:
+        item["cost"] = round(
+            estimate_cost(
+                item["prompt_tokens"],
+                item["prompt_cache_hit_tokens"],
+                item["completion_tokens"],
+                pricing,
+            ),
+            4,
+        )
+        # 各次调用耗时之和
+        seconds = (
+            item["calls"] * first_token_seconds
+            + item["completion_tokens"] / output_tokens_per_second
+        )
+        item["minutes"] = round(seconds / 60, 2)
+
+    # 同一块内的分类轮次存在依赖，只能串行执行；各块按并发数分批并行
+    chunk_seconds = [
+        sum(
+            call_seconds(
+                item["completion_tokens"],
+                first_token_seconds,
+                output_tokens_per_second,
+            )
+            for item in chunk
+        )
+        for chunk in chunk_rounds
+    ]
+    classify_seconds = 0.0
+    for start in range(0, len(chunk_seconds), max(concurrency, 1)):
+        classify_seconds += max(chunk_seconds[start : start + max(concurrency, 1)])
+    if label_round is not None:
+        classify_seconds += call_seconds(
+            label_round["completion_tokens"],
+            first_token_seconds,
+            output_tokens_per_second,
+        )
+
+    return {
+        "folder": folder_path,
+        "total_files": len(normalized),
+        "files_needing_llm": len(needs_llm),
+        "concurrency": concurrency,
+        "title_fix": title_fix,
+        "classification_chunks": len(chunk_rounds),
+        "classification_rounds": rounds,
+        "total_calls": title_fix["calls"] + sum(item["calls"] for item in rounds),
+        "total_prompt_tokens": title_fix["prompt_tokens"]
+        + sum(item["prompt_tokens"] for item in rounds),
+        "total_completion_tokens": title_fix["completion_tokens"]
+        + sum(item["completion_tokens"] for item in rounds),
+        "total_cost": round(
+            title_fix["cost"] + sum(item["cost"] for item in rounds), 4
+        ),
+        "total_minutes": round((title_seconds + classify_seconds) / 60, 2),
+    }
@@ -2,23 +2,41 @@
 """
 使用KMeans对PDF文件名进行聚类预处理
 """
-import json
+import functools
+import itertools
+import logging
+import threading
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import matplotlib.pyplot as plt
 
+from artifact_store import ArtifactStore, make_key
 from config import FORMATED_PDF_NAME_FOLDER
-from load_pdf import load_pdf_names
+from load_pdf import iter_pdf_names, load_pdf_names
 
+TFIDF_PARAMS = {"analyzer": "char", "ngram_range": (2, 3)}
+RANDOM_STATE = 42
+# pyplot不是线程安全的，多个流水线并发运行时需串行绘图
+_PLOT_LOCK = threading.Lock()
+# 流式聚类使用无状态的哈希向量化，特征维度固定，无需预先拟合词表
+HASHING_PARAMS = {
+    "analyzer": "char",
+    "ngram_range": (2, 3),
+    "n_features": 2**18,
+    "alternate_sign": False,
+}
 
-def find_optimal_clusters(data, max_k):
+
+def find_optimal_clusters(data, max_k, plot_path="elbow_method.png"):
     """
     使用肘部法则找到最佳聚类数量
 
     Args:
         data (array): 输入数据。
         max_k (int): 最大聚类数量。
+        plot_path (str): 肘部图保存路径。
 
     Returns:
         int: 最佳聚类数量。
@@ -26,51 +44,157 @@ def find_optimal_clusters(data, max_k):
     iters = range(1, max_k + 1)
     sse = []
     for k in iters:
-        kmeans = KMeans(n_clusters=k, random_state=42)
+        kmeans = KMeans(n_clusters=k, random_state=RANDOM_STATE)
         kmeans.fit(data)
         sse.append(kmeans.inertia_)
     # 绘制肘部图
-    plt.figure(figsize=(10, 8))
-    plt.plot(iters, sse, marker="o")
-    plt.xlabel("Cluster Centers")
-    plt.ylabel("SSE")
-    plt.title("Elbow Method For Optimal k")
-    plt.savefig("elbow_method.png")
-    plt.close()
+    if not plot_path:
+        return sse.index(min(sse)) + 1
+    with _PLOT_LOCK:
+        plt.figure(figsize=(10, 8))
+        plt.plot(iters, sse, marker="o")
+        plt.xlabel("Cluster Centers")
+        plt.ylabel("SSE")
+        plt.title("Elbow Method For Optimal k")
+        plt.savefig(plot_path)
+        plt.close()
 
     return sse.index(min(sse)) + 1
 
 
+def vectorize_pdf_names(pdf_names, store=None):
+    """
+    使用TF-IDF向量化文件名，若存储中已有相同输入的矩阵则直接加载。
+
+    Args:
+        pdf_names (list): PDF文件名列表。
+        store (ArtifactStore): 阶段产物存储，为None时不使用缓存。
+
+    Returns:
+        tuple: (TF-IDF稀疏矩阵, 产物键)。
+    """
+    key = make_key("tfidf", pdf_names, **TFIDF_PARAMS)
+    if store is not None:
+        x = store.load_sparse("tfidf", key)
+        if x is not None:
+            logging.info("TF-IDF矩阵命中缓存: %s", key[:12])
+            return x, key
+
+    vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+    x = vectorizer.fit_transform(pdf_names)
+    if store is not None:
+        store.save_sparse("tfidf", key, x)
+    return x, key
+
+
 def preprocess_with_kmeans(
-    max_clusters=10, output_file="pdf_names_clustered_results.json"
+    pdf_names=None, max_clusters=10, store=None, plot_path="elbow_method.png"
 ):
     """
     使用KMeans对PDF文件名进行聚类预处理
 
     Args:
+        pdf_names (list): PDF文件名列表，为None时从规范化文件夹中读取。
         max_clusters (int): 最大聚类数量。
-        output_file (str): 聚类结果输出文件名。
+        store (ArtifactStore): 阶段产物存储，为None时使用默认存储。
+        plot_path (str): 肘部图保存路径。
 
     Returns:
-        None
+        tuple: (聚类结果字典 {类别序号: [文件名, ...]}, 聚类结果产物键)。
     """
-    pdf_names = load_pdf_names(FORMATED_PDF_NAME_FOLDER)
-    # 使用TF-IDF向量化文件名
-    vectorizer = TfidfVectorizer(analyzer="char", ngram_range=(2, 3))
-    x = vectorizer.fit_transform(pdf_names)
+    if store is None:
+        store = ArtifactStore()
+    if pdf_names is None:
+        pdf_names = load_pdf_names(FORMATED_PDF_NAME_FOLDER)
+
+    x, tfidf_key = vectorize_pdf_names(pdf_names, store)
+    key = make_key(
+        "kmeans", tfidf_key, max_clusters=max_clusters, random_state=RANDOM_STATE
+    )
 
-    # 找到最佳聚类数量
-    optimal_clusters = find_optimal_clusters(x, max_clusters)
+    arrays = store.load_arrays("kmeans", key)
+    if arrays is not None:
+        logging.info("聚类结果命中缓存: %s", key[:12])
+        cluster_labels = arrays["labels"]
+        optimal_clusters = int(arrays["n_clusters"])
+    else:
+        # 找到最佳聚类数量
+        optimal_clusters = find_optimal_clusters(x, max_clusters, plot_path)
 
-    # 应用KMeans聚类
-    kmeans = KMeans(n_clusters=optimal_clusters, random_state=42)
-    cluster_labels = kmeans.fit_predict(x)
+        # 应用KMeans聚类
+        kmeans = KMeans(n_clusters=optimal_clusters, random_state=RANDOM_STATE)
+        cluster_labels = kmeans.fit_predict(x)
+        store.save_arrays(
+            "kmeans",
+            key,
+            labels=cluster_labels.astype(np.int32),
+            n_clusters=np.array(optimal_clusters),
+        )
 
     # 准备返回结果
     clustered_files = {i: [] for i in range(optimal_clusters)}
     for file, label in zip(pdf_names, cluster_labels):
-        clustered_files[label].append(file)
+        clustered_files[int(label)].append(file)
+
+    return clustered_files, key
 
-    # 将聚类结果转换为JSON格式并保存
+
+def iter_chunks(names, chunk_size):
+    """将文件名迭代器切分为固定大小的列表块"""
+    iterator = iter(names)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def preprocess_with_minibatch_kmeans(
+    names_factory=None,
+    n_clusters=10,
+    chunk_size=10000,
+    output_file="pdf_names_clustered_labels.tsv",
+):
+    """
+    流式聚类：分块读取文件名，使用哈希向量化与MiniBatchKMeans增量训练，
+    再分块预测并写出标签，峰值内存只与块大小相关，与文件总数无关。
+
+    Args:
+        names_factory (callable): 每次调用返回一个新的文件名迭代器，需可被调用两次
+            （训练一遍、预测一遍）；为None时逐个读取规范化文件夹中的文件名。
+        n_clusters (int): 聚类数量。
+        chunk_size (int): 每块的文件名数量，不应小于聚类数量。
+        output_file (str): 标签输出文件，每行为"文件名\t类别序号"。
+
+    Returns:
+        list: 每个类别的文件数量。
+    """
+    if names_factory is None:
+        names_factory = functools.partial(iter_pdf_names, FORMATED_PDF_NAME_FOLDER)
+
+    vectorizer = HashingVectorizer(**HASHING_PARAMS)
+    kmeans = MiniBatchKMeans(
+        n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=3
+    )
+
+    # 第一遍：增量训练
+    trained = False
+    for chunk in iter_chunks(names_factory(), chunk_size):
+        if not trained and len(chunk) < n_clusters:
+            raise ValueError(f"首个数据块的文件数量({len(chunk)})少于聚类数量({n_clusters})")
+        kmeans.partial_fit(vectorizer.transform(chunk))
+        trained = True
+    if not trained:
+        logging.warning("没有可聚类的文件名")
+        return [0] * n_clusters
+
+    # 第二遍：分块预测并写出标签
+    cluster_sizes = np.zeros(n_clusters, dtype=np.int64)
     with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(clustered_files, f, ensure_ascii=False, indent=4)
+        for chunk in iter_chunks(names_factory(), chunk_size):
+            labels = kmeans.predict(vectorizer.transform(chunk))
+            cluster_sizes += np.bincount(labels, minlength=n_clusters)
+            f.writelines(f"{name}\t{label}\n" for name, label in zip(chunk, labels))
+
+    logging.info("流式聚类完成，各类别文件数量: %s", cluster_sizes.tolist())
+    return cluster_sizes.tolist()
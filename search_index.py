@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""分类文献库检索索引模块
+
+在 move_pdfs_to_classified_folders 整理完成后，为分类文件夹中的论文建立本地检索索引：
+
+1. 使用与KMeans预处理相同的字符n-gram TF-IDF参数，对"标题 + 首页文本"向量化，
+   并经TruncatedSVD降维，保存为可内存映射的 float32 矩阵。
+2. 建立字符二元组（bigram）倒排索引，用于快速筛选候选文献。
+3. 查询时先通过倒排索引筛选候选，再按向量余弦相似度与词项命中率综合排序，返回前k篇
+   论文及其所属分类。
+
+索引目录结构：
+    docs.json            文献元数据（标题、分类、路径）
+    vectors.npy          降维后的文献向量（float32，已归一化）
+    vocabulary.json      TF-IDF词表
+    idf.npy              TF-IDF的idf权重
+    components.npy       SVD投影矩阵（float32）
+    ngrams.json          倒排索引的bigram列表（已排序）
+    ngram_offsets.npy    每个bigram在倒排表中的起始位置
+    postings.npy         倒排表（文献序号，int32）
+    text_cache.json      首页文本缓存，重建索引时复用未变化文件的文本
+"""
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from config import PDF_CLASSIFICATION_DIR, SEARCH_INDEX_DIR
+from pdf_name_normalize import load_first_page_text
+from preprocess_title_with_kmeans import TFIDF_PARAMS, RANDOM_STATE
+
+SVD_COMPONENTS = 128
+# 限制词表大小，使SVD投影矩阵保持在数十MB以内
+MAX_FEATURES = 100_000
+LEXICAL_WEIGHT = 0.3
+
+
+def char_bigrams(text):
+    """返回文本中去除空白后的字符二元组集合"""
+    text = "".join(text.lower().split())
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def collect_documents(classification_dir):
+    """
+    遍历分类文件夹，收集PDF文献及其所属分类。
+
+    Args:
+        classification_dir (str): 分类文件夹路径。
+
+    Returns:
+        list: 文献元数据列表，分类为相对于分类文件夹的路径。
+    """
+    documents = []
+    for root, dirs, files in os.walk(classification_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        category = os.path.relpath(root, classification_dir)
+        for file in sorted(files):
+            if file.lower().endswith(".pdf"):
+                documents.append(
+                    {
+                        "title": os.path.splitext(file)[0],
+                        "category": "" if category == "." else category,
+                        "path": os.path.join(root, file),
+                    }
+                )
+    return documents
+
+
+def load_texts(documents, text_cache):
+    """
+    提取每篇文献的首页文本，未变化的文件复用缓存。
+
+    Args:
+        documents (list): 文献元数据列表。
+        text_cache (dict): {路径: [大小, 修改时间, 文本]}。
+
+    Returns:
+        tuple: (文本列表, 更新后的缓存)。
+    """
+    texts = []
+    new_cache = {}
+    for document in documents:
+        path = document["path"]
+        stat = os.stat(path)
+        cached = text_cache.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            text = cached[2]
+        else:
+            text = load_first_page_text(path)
+        new_cache[path] = [stat.st_size, stat.st_mtime_ns, text]
+        texts.append(text)
+    return texts, new_cache
+
+
+def build_inverted_index(corpus):
+    """
+    构建字符二元组倒排索引。
+
+    Args:
+        corpus (list): 文献文本列表。
+
+    Returns:
+        tuple: (已排序的bigram列表, 起始位置数组, 倒排表数组)。
+    """
+    postings = {}
+    for doc_id, text in enumerate(corpus):
+        for gram in char_bigrams(text):
+            postings.setdefault(gram, []).append(doc_id)
+    ngrams = sorted(postings)
+    offsets = np.zeros(len(ngrams) + 1, dtype=np.int64)
+    for i, gram in enumerate(ngrams):
+        offsets[i + 1] = offsets[i] + len(postings[gram])
+    flat = np.fromiter(
+        (doc_id for gram in ngrams for doc_id in postings[gram]),
+        dtype=np.int32,
+        count=int(offsets[-1]),
+    )
+    return ngrams, offsets, flat
+
+
+def _save_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_search_index(
+    classification_dir=PDF_CLASSIFICATION_DIR,
+    index_dir=SEARCH_INDEX_DIR,
+    include_text=True,
+):
+    """
+    为分类文献库建立检索索引。
+
+    Args:
+        classification_dir (str): 分类文件夹路径。
+        index_dir (str): 索引保存目录。
+        include_text (bool): 是否提取首页文本参与索引。
+
+    Returns:
+        int: 已索引的文献数量。
+    """
+    documents = collect_documents(classification_dir)
+    if len(documents) < 2:
+        logging.warning("分类文件夹中的文献数量不足，无法建立索引: %s", classification_dir)
+        return 0
+    os.makedirs(index_dir, exist_ok=True)
+
+    texts = [""] * len(documents)
+    if include_text:
+        cache_path = os.path.join(index_dir, "text_cache.json")
+        text_cache = _load_json(cache_path) if os.path.exists(cache_path) else {}
+        texts, text_cache = load_texts(documents, text_cache)
+        _save_json(cache_path, text_cache)
+    corpus = [f"{doc['title']} {text}" for doc, text in zip(documents, texts)]
+
+    vectorizer = TfidfVectorizer(
+        **TFIDF_PARAMS, max_features=MAX_FEATURES, dtype=np.float32
+    )
+    x = vectorizer.fit_transform(corpus)
+    n_components = min(SVD_COMPONENTS, x.shape[0] - 1, x.shape[1] - 1)
+    svd = TruncatedSVD(n_components=n_components, random_state=RANDOM_STATE)
+    vectors = svd.fit_transform(x).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1, norms)
+
+    ngrams, offsets, postings = build_inverted_index(corpus)
+
+    _save_json(os.path.join(index_dir, "docs.json"), documents)
+    _save_json(
+        os.path.join(index_dir, "vocabulary.json"),
+        {gram: int(col) for gram, col in vectorizer.vocabulary_.items()},
+    )
+    np.save(os.path.join(index_dir, "vectors.npy"), vectors)
+    np.save(os.path.join(index_dir, "idf.npy"), vectorizer.idf_.astype(np.float32))
+    np.save(
+        os.path.join(index_dir, "components.npy"), svd.components_.astype(np.float32)
+    )
+    _save_json(os.path.join(index_dir, "ngrams.json"), ngrams)
+    np.save(os.path.join(index_dir, "ngram_offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "postings.npy"), postings)
+
+    logging.info("检索索引建立完成，共 %d 篇文献: %s", len(documents), index_dir)
+    return len(documents)
+
+
+class SearchIndex:
+    """加载到内存（矩阵部分为内存映射）的检索索引，可重复查询"""
+
+    def __init__(self, index_dir=SEARCH_INDEX_DIR):
+        self.docs = _load_json(os.path.join(index_dir, "docs.json"))
+        self.vocabulary = _load_json(os.path.join(index_dir, "vocabulary.json"))
+        self.ngrams = _load_json(os.path.join(index_dir, "ngrams.json"))
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.idf = np.load(os.path.join(index_dir, "idf.npy"))
+        self.components = np.load(
+            os.path.join(index_dir, "components.npy"), mmap_mode="r"
+        )
+        self.offsets = np.load(os.path.join(index_dir, "ngram_offsets.npy"))
+        self.postings = np.load(os.path.join(index_dir, "postings.npy"), mmap_mode="r")
+        self.analyzer = TfidfVectorizer(**TFIDF_PARAMS).build_analyzer()
+
+    def embed(self, query):
+        """将查询文本投影到与文献向量相同的空间"""
+        counts = {}
+        for gram in self.analyzer(query):
+            col = self.vocabulary.get(gram)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        if not counts:
+            return np.zeros(self.components.shape[0], dtype=np.float32)
+        cols = np.array(sorted(counts), dtype=np.int64)
+        weights = np.array([counts[c] for c in cols], dtype=np.float32) * self.idf[cols]
+        weights /= np.linalg.norm(weights)
+        # 只读取查询涉及的投影矩阵列，避免整体载入内存
+        vector = self.components[:, cols] @ weights
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lexical_hits(self, query):
+        """统计每篇文献命中的查询bigram数量"""
+        grams = char_bigrams(query)
+        hits = np.zeros(len(self.docs), dtype=np.float32)
+        for gram in grams:
+            i = bisect_left(self.ngrams, gram)
+            if i < len(self.ngrams) and self.ngrams[i] == gram:
+                hits[self.postings[self.offsets[i] : self.offsets[i + 1]]] += 1
+        return hits / max(len(grams), 1)
+
+    def search(self, query, top_k=10):
+        """
+        检索与查询最相关的文献。
+
+        Args:
+            query (str): 查询文本，例如"本体构建"。
+            top_k (int): 返回结果数量。
+
+        Returns:
+            list: 结果字典列表，包含标题、分类、路径与得分。
+        """
+        hits = self.lexical_hits(query)
+        embedding = self.embed(query)
+        candidates = np.flatnonzero(hits)
+        if candidates.size == 0:
+            # 没有字面命中且查询向量为零时，任何文献都不相关
+            if not np.any(embedding):
+                return []
+            candidates = np.arange(len(self.docs))
+        scores = self.vectors[candidates] @ embedding
+        scores += LEXICAL_WEIGHT * hits[candidates]
+
+        top_k = min(top_k, candidates.size)
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            dict(self.docs[int(candidates[i])], score=round(float(scores[i]), 4))
+            for i in top
+        ]
+
+
+def search_library(query, top_k=10, index_dir=SEARCH_INDEX_DIR):
+    """
+    加载索引并检索，打印结果与耗时。
+
+    Args:
+        query (str): 查询文本。
+        top_k (int): 返回结果数量。
+        index_dir (str): 索引目录。
+
+    Returns:
+        list: 检索结果列表。
+    """
+    index = SearchIndex(index_dir)
+    start = time.perf_counter()
+    results = index.search(query, top_k)
+    elapsed = (time.perf_counter() - start) * 1000
+    for rank, result in enumerate(results, start=1):
+        print(f"{rank}. [{result['category']}] {result['title']} ({result['score']})")
+    print(f">> 检索耗时: {elapsed:.1f} ms")
+    return results
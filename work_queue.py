@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""基于文件锁的共享租约队列
+
+多台机器通过共享目录（如NFS挂载）协同处理同一批任务。SQLite的WAL模式依赖
+共享内存，不能在NFS上安全使用，因此队列完全基于文件的原子重命名实现：
+
+    <queue_dir>/pending/<id>.json   待处理任务
+    <queue_dir>/leased/<id>.json    已被领取的任务，文件修改时间即最近一次心跳
+    <queue_dir>/done/<id>.json      已完成任务及其结果
+    <queue_dir>/failed/<id>.json    超过最大尝试次数的任务
+
+1. 领取：将任务从 pending 重命名到 leased，重命名是原子操作，只有一个节点能成功。
+   各节点缓存一份随机打乱的 pending 列表依次尝试，用完后才重新读取目录，
+   避免每次领取都遍历整个目录，也避免所有节点争抢同一个任务。
+2. 心跳：持有租约的节点定期更新 leased 文件的修改时间。
+3. 回收：心跳超过租约时长的任务被重新放回 pending，尝试次数加一。
+4. 完成：以独占方式创建 done 文件，同一任务只会被记录一次结果。
+
+各节点的系统时钟需保持同步（如启用NTP），租约超时依赖时间比较。
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+STATES = ("pending", "leased", "done", "failed")
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def default_worker_id():
+    """返回 <主机名>-<进程号> 形式的节点标识"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseQueue:
+    """基于共享目录的租约队列"""
+
+    def __init__(
+        self,
+        queue_dir,
+        lease_seconds=DEFAULT_LEASE_SECONDS,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        worker_id=None,
+    ):
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or default_worker_id()
+        self._pending_names = []
+        for state in STATES:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+    def _path(self, state, item_id):
+        return os.path.join(self.queue_dir, state, item_id + ".json")
+
+    def _tmp_path(self, state, item_id):
+        # 以 .tmp 结尾的文件不会被其他节点当作任务领取
+        return self._path(state, item_id) + f".{self.worker_id}.tmp"
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(path, data):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @staticmethod
+    def item_id(key):
+        """根据任务键计算任务标识"""
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def enqueue(self, key, payload=None):
+        """
+        添加任务，同一任务键在任一状态下已存在时跳过。
+
+        Args:
+            key (str): 任务键，例如源文件名。
+            payload (dict): 任务附加数据。
+
+        Returns:
+            bool: 是否新增了任务。
+        """
+        item_id = self.item_id(key)
+        if any(os.path.exists(self._path(state, item_id)) for state in STATES):
+            return False
+        tmp_path = self._tmp_path("pending", item_id)
+        self._write(tmp_path, {"key": key, "payload": payload or {}, "attempts": 0})
+        try:
+            # 以硬链接方式发布，目标已存在时失败，避免并发入队覆盖
+            os.link(tmp_path, self._path("pending", item_id))
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def claim(self):
+        """
+        领取一个待处理任务。
+
+        Returns:
+            tuple: (任务标识, 任务数据)，没有可领取任务时返回 (None, None)。
+        """
+        pending_dir = os.path.join(self.queue_dir, "pending")
+        listed = False
+        while True:
+            if not self._pending_names:
+                if listed:
+                    return None, None
+                # 缓存列表用完后才重新读取目录，并随机打乱以分散各节点的领取顺序
+                self._pending_names = [
+                    name for name in os.listdir(pending_dir) if name.endswith(".json")
+                ]
+                random.shuffle(self._pending_names)
+                listed = True
+                continue
+            name = self._pending_names.pop()
+            item_id = name[: -len(".json")]
+            pending_path = os.path.join(pending_dir, name)
+            leased_path = self._path("leased", item_id)
+            try:
+                # 先更新修改时间再重命名，避免刚领取的任务被判定为租约超时
+                os.utime(pending_path)
+                os.rename(pending_path, leased_path)
+            except FileNotFoundError:
+                continue  # 已被其他节点领取
+            return item_id, self._read(leased_path)
+
+    def heartbeat(self, item_id):
+        """
+        续租任务。
+
+        Returns:
+            bool: 租约是否仍然有效。
+        """
+        try:
+            os.utime(self._path("leased", item_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, item_id, result=None):
+        """
+        记录任务结果并释放租约。
+
+        Returns:
+            bool: 是否为首次记录该任务的结果。
+        """
+        leased_path = self._path("leased", item_id)
+        try:
+            item = self._read(leased_path)
+        except FileNotFoundError:
+            item = {}
+        item.update(result=result or {}, worker=self.worker_id)
+        try:
+            with open(self._path("done", item_id), "x", encoding="utf-8") as f:
+                json.dump(item, f, ensure_ascii=False)
+            first = True
+        except FileExistsError:
+            first = False
+        try:
+            os.remove(leased_path)
+        except FileNotFoundError:
+            pass
+        return first
+
+    def is_done(self, item_id):
+        """判断任务是否已完成"""
+        return os.path.exists(self._path("done", item_id))
+
+    def _requeue(self, item_id, error=None):
+        """将已领取的任务放回队列或标记为失败，任务已被其他节点处理时返回False"""
+        tmp_path = self._tmp_path("pending", item_id)
+        try:
+            os.rename(self._path("leased", item_id), tmp_path)
+        except FileNotFoundError:
+            return False
+        item = self._read(tmp_path)
+        item["attempts"] = item.get("attempts", 0) + 1
+        if error:
+            item["error"] = error
+        self._write(tmp_path, item)
+        state = "failed" if item["attempts"] >= self.max_attempts else "pending"
+        os.rename(tmp_path, self._path(state, item_id))
+        return True
+
+    def fail(self, item_id, error):
+        """任务处理失败，放回队列重试或标记为失败"""
+        self._requeue(item_id, error)
+
+    def reclaim_expired(self):
+        """
+        回收心跳超时的任务。
+
+        Returns:
+            int: 回收的任务数量。
+        """
+        leased_dir = os.path.join(self.queue_dir, "leased")
+        deadline = time.time() - self.lease_seconds
+        reclaimed = 0
+        for name in os.listdir(leased_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                if os.stat(os.path.join(leased_dir, name)).st_mtime >= deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            item_id = name[: -len(".json")]
+            if self._requeue(item_id, "lease expired"):
+                logging.warning("回收超时租约: %s", item_id)
+                reclaimed += 1
+        return reclaimed
+
+    def counts(self):
+        """返回各状态的任务数量"""
+        return {
+            state: sum(
+                1
+                for name in os.listdir(os.path.join(self.queue_dir, state))
+                if name.endswith(".json")
+            )
+            for state in STATES
+        }
+
+
+class Heartbeat:
+    """在后台线程中定期为任务续租的上下文管理器"""
+
+    def __init__(self, queue, item_id):
+        self.queue = queue
+        self.item_id = item_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(self.queue.lease_seconds / 3, 1)
+        while not self._stop.wait(interval):
+            if not self.queue.heartbeat(self.item_id):
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()